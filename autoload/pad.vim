@@ -2,13 +2,27 @@
 
 " Pad Information:  {{{1
  
+" The list keeps the data of each line, so these don't need to parse it unless
+" the buffer was changed by other means.
+function! s:SelectedInfo()
+    if getline('.') == "" || !has("python")
+        return {}
+    endif
+    python import vim_pad.handler
+    return pyeval("vim_pad.handler.selected_info()")
+endfunction
+
 " Gets the title of the currently selected pad
 function! pad#GetPadTitle()
+    let info = s:SelectedInfo()
+    if has_key(info, 'title')
+        return info.title
+    endif
     if getline('.') != ""
         try
             let retval = split(split(substitute(getline('.'), '↲','\n', "g"), '\n')[0], '\%u2e25 ')[1]
         catch /E684/
-            let retval "EMPTY"
+            let retval = "EMPTY"
         endtry
         return retval
     endif
@@ -17,6 +31,10 @@ endfunction
 
 " Gets the human readable date of the currently selected pad
 function! pad#GetPadHumanDate()
+    let info = s:SelectedInfo()
+    if has_key(info, 'date')
+        return info.date
+    endif
     if getline('.') != ""
         return split(split(getline('.'), ' │')[0], '@')[1]
     endif
@@ -25,6 +43,10 @@ endfunction
 
 " Gets the id of the currently selected pad
 function! pad#GetPadId()
+    let info = s:SelectedInfo()
+    if has_key(info, 'id')
+        return info.id
+    endif
     if getline('.') != ""
         return split(getline('.'))[0]
     endif
@@ -33,13 +55,17 @@ endfunction
 
 " Operations: {{{1
 if has("python")
-    python import vim_pad
+    if g:pad#dir == ""
+        echom "vim-pad: IMPORTANT: please set g:pad#dir to a valid path in your vimrc."
+        redraw
+    endif
 
 " Global {{{2
 
 function! pad#PadCmd(args, bang)
+    python import vim_pad.handler, vim_pad.timestamps
     let arg_data = split(a:args, ' ')
-    if arg_data[0] =~ '\(new\|ls\|this\)'
+    if arg_data[0] =~ '\(new\|ls\|this\|cache\|stats\)'
         let l:args = join(arg_data[1:], ' ')
         if arg_data[0] == 'ls'
             execute "python vim_pad.handler.display('".l:args."', '".a:bang."')"
@@ -52,6 +78,10 @@ function! pad#PadCmd(args, bang)
                 " make sure the directory exists when we try to save
                 exe "au! BufWritePre,FileWritePre <buffer> call mkdir(fnamemodify('".pth."', ':h'), 'p')"
             endif
+        elseif arg_data[0] == 'cache'
+            python import vim_pad.handler; vim_pad.handler.show_cache_stats()
+        elseif arg_data[0] == 'stats'
+            python import vim_pad.handler; vim_pad.handler.show_stats()
         elseif arg_data[0] == 'this' && g:pad#local_dir != '' "only allow this if g:pad#local_dir is set
             let pth = expand('%:p:h'). '/' . g:pad#local_dir . "/" . expand('%:t'). '.txt' 
             execute "python vim_pad.handler.open_pad(path='".pth."', first_line='".expand('%:t')."')"
@@ -65,7 +95,7 @@ function! pad#PadCmdComplete(A,L,P)
     let cmd_args = split(a:L, ' ', 1)[1:]
     echom string(cmd_args)
     if len(cmd_args) == 1
-        let options = "ls\nnew"
+        let options = "ls\nnew\ncache\nstats"
         if g:pad#local_dir != '' "only complete 'this' is g:pad#local_dir is set
             let options .= "\nthis"
         endif
@@ -84,77 +114,169 @@ function! pad#ListPads(query, archive)
 endfunction
 
 function! pad#SearchPads()
-    python vim_pad.handler.search_pads()
+    python import vim_pad.handler; vim_pad.handler.search_pads()
 endfunction
 
 function! pad#GlobalIncrementalSearch(open)
-    python import vim
+    python import vim, vim_pad.handler
     python vim_pad.handler.global_incremental_search(bool(int(vim.eval('a:open'))))
 endfunction
 
+" Search jobs {{{2
+
+let s:search_job = 0
+let s:search_job_id = 0
+let s:search_job_running = 0
+let s:nvim_partials = {}
+
+function! pad#StartSearchJob(command, id)
+    call pad#StopSearchJob()
+    let s:search_job_id = a:id
+    let s:search_job_running = 1
+    if has('nvim')
+        let s:nvim_partials[a:id] = ''
+        let s:search_job = jobstart(a:command, {
+                    \ 'on_stdout': function('s:OnNvimSearchOutput', [a:id]),
+                    \ 'on_exit': function('s:OnNvimSearchExit', [a:id])})
+    else
+        let s:search_job = job_start(a:command, {
+                    \ 'out_mode': 'nl',
+                    \ 'out_cb': function('s:OnSearchOutput', [a:id]),
+                    \ 'close_cb': function('s:OnSearchClose', [a:id])})
+    endif
+endfunction
+
+function! pad#StopSearchJob()
+    if s:search_job_running
+        if has('nvim')
+            call jobstop(s:search_job)
+        else
+            call job_stop(s:search_job)
+        endif
+        let s:search_job_running = 0
+    endif
+endfunction
+
+function! pad#WaitSearchJob()
+    while s:search_job_running
+        sleep 10m
+    endwhile
+endfunction
+
+function! s:OnSearchOutput(id, channel, msg)
+    call s:OnSearchLines(a:id, [a:msg])
+endfunction
+
+function! s:OnSearchClose(id, channel)
+    call s:OnSearchDone(a:id)
+endfunction
+
+" neovim gives us chunks of output, where lines can be split between calls;
+" a stopped job can still send some, so each job keeps its own partial line
+function! s:OnNvimSearchOutput(id, job, data, event)
+    let l:lines = copy(a:data)
+    let l:lines[0] = get(s:nvim_partials, a:id, '') . l:lines[0]
+    let s:nvim_partials[a:id] = l:lines[-1]
+    call s:OnSearchLines(a:id, l:lines[:-2])
+endfunction
+
+function! s:OnNvimSearchExit(id, job, code, event)
+    call s:OnSearchLines(a:id, [get(s:nvim_partials, a:id, '')])
+    if has_key(s:nvim_partials, a:id)
+        call remove(s:nvim_partials, a:id)
+    endif
+    call s:OnSearchDone(a:id)
+endfunction
+
+function! s:OnSearchLines(id, lines)
+    python import vim, vim_pad.handler; vim_pad.handler.on_async_output(int(vim.eval('a:id')), vim.eval('a:lines'))
+endfunction
+
+function! s:OnSearchDone(id)
+    if a:id == s:search_job_id
+        let s:search_job_running = 0
+    endif
+    python import vim, vim_pad.handler; vim_pad.handler.on_async_exit(int(vim.eval('a:id')))
+endfunction
+
+" List rendering {{{2
+
+function! pad#RenderMore(id, timer)
+    python import vim, vim_pad.handler; vim_pad.handler.render_more(int(vim.eval('a:id')))
+endfunction
+
+function! pad#TouchNote(path)
+    python import vim, vim_pad.utils; vim_pad.utils.touch(vim.eval('a:path'))
+endfunction
+
 " Pad local {{{2
 
 function! pad#UpdatePad()
-    python vim_pad.pad_local.update()
+    python import vim_pad.pad_local; vim_pad.pad_local.update()
 endfunction
 
 function! pad#DeleteThis()
-    python vim_pad.pad_local.delete()
+    python import vim_pad.pad_local; vim_pad.pad_local.delete()
 endfunction
 
 function! pad#AddModeline()
-    python vim_pad.pad_local.add_modeline()
+    python import vim_pad.pad_local; vim_pad.pad_local.add_modeline()
 endfunction
 
 function! pad#MoveToFolder()
-    python vim_pad.pad_local.move_to_folder()
+    python import vim_pad.pad_local; vim_pad.pad_local.move_to_folder()
 endfunction
 
 function! pad#MoveToSaveDir()
-    python vim_pad.pad_local.move_to_savedir()
+    python import vim_pad.pad_local; vim_pad.pad_local.move_to_savedir()
 endfunction
 
 function! pad#Archive()
-    python vim_pad.pad_local.archive()
+    python import vim_pad.pad_local; vim_pad.pad_local.archive()
 endfunction
 
 function! pad#Unarchive()
-    python vim_pad.pad_local.unarchive()
+    python import vim_pad.pad_local; vim_pad.pad_local.unarchive()
 endfunction
 
 " List local {{{2
 
 function! pad#EditPad()
-    python vim_pad.list_local.edit_pad()
+    python import vim_pad.list_local; vim_pad.list_local.edit_pad()
 endfunction
 
-function! pad#DeletePad()
-    python vim_pad.list_local.delete_pad()
+function! pad#DeletePad() range
+    python import vim, vim_pad.list_local; vim_pad.list_local.delete_pad(int(vim.eval("a:firstline")), int(vim.eval("a:lastline")))
 endfunction
 
-function! pad#MovePad()
-    python vim_pad.list_local.move_to_folder()
+function! pad#MovePad() range
+    python import vim, vim_pad.list_local; vim_pad.list_local.move_to_folder(None, int(vim.eval("a:firstline")), int(vim.eval("a:lastline")))
 endfunction
 
-function! pad#MovePadToSaveDir()
-    python vim_pad.list_local.move_to_savedir()
+function! pad#MovePadToSaveDir() range
+    python import vim, vim_pad.list_local; vim_pad.list_local.move_to_savedir(int(vim.eval("a:firstline")), int(vim.eval("a:lastline")))
 endfunction
 
-function! pad#ArchivePad()
-    python vim_pad.list_local.archive_pad()
+function! pad#ArchivePad() range
+    python import vim, vim_pad.list_local; vim_pad.list_local.archive_pad(int(vim.eval("a:firstline")), int(vim.eval("a:lastline")))
 endfunction
 
-function! pad#UnarchivePad()
-    python vim_pad.list_local.unarchive_pad()
+function! pad#UnarchivePad() range
+    python import vim, vim_pad.list_local; vim_pad.list_local.unarchive_pad(int(vim.eval("a:firstline")), int(vim.eval("a:lastline")))
 endfunction
 
 function! pad#IncrementalSearch()
-    python vim_pad.list_local.incremental_search()
+    python import vim_pad.list_local; vim_pad.list_local.incremental_search()
+endfunction
+
+function! pad#LoadMore()
+    python import vim_pad.handler; vim_pad.handler.load_more()
 endfunction
 
 function! pad#Sort()
-    let s:sort_type = input("[pad] sort list by (title=1, tags=2, date=3): ", "1")
+    let s:sort_type = input("[pad] sort list by (title=1, tags=2, date=3, folder=4, size=5): ", "1")
     if s:sort_type != ""
+            python import vim_pad.list_local
             execute "python vim_pad.list_local.sort('".s:sort_type."')"
     endif
     redraw!
@@ -0,0 +1,393 @@
+# coding=utf-8
+""" Runs vim-pad outside of vim, for benchmarks.
+
+install_vim() puts a stand-in for the vim module in sys.modules: it keeps a
+single buffer and window, answers the vim.eval calls vim-pad makes (settings,
+getchar()...) and runs the timers that render the list when asked to.
+make_corpus() creates a tree of notes that looks like a real collection, and
+measure() times a call along with its memory peak and the filesystem calls it
+makes.
+"""
+import __builtin__
+import gc
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+import types
+from distutils.spawn import find_executable
+
+PYTHONX = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pythonx")
+if PYTHONX not in sys.path:
+    sys.path.insert(0, PYTHONX)
+
+DEFAULT_SETTINGS = {
+    "dir": "",
+    "local_dir": "",
+    "default_file_extension": "",
+    "default_format": "markdown",
+    "read_nchars_from_files": "200",
+    "title_first_line": "0",
+    "show_dir": "1",
+    "rename_files": "1",
+    "search_backend": "grep",
+    "search_ignorecase": "1",
+    "query_filenames": "0",
+    "query_dirnames": "1",
+    "position": {"list": "bottom", "pads": "bottom"},
+    "window_height": "8",
+    "window_width": "40",
+    "open_in_split": "1",
+    "async_search": "0",
+    "search_ranked": "0",
+    "search_debounce": "0",
+    "search_time_budget": "100",
+    "worker_python": sys.executable,
+    "worker_max_memory": "256",
+    "max_listed": "0",
+    "lazy_render": "1",
+    "render_chunk_size": "500",
+    "parallel_read": "0",
+    "watch_dirs": "0",
+    "watch_interval": "5",
+    "cache_max_entries": "0",
+    "stats": "0",
+    "stats_history": "20",
+    "stats_log": "",
+}
+
+class Buffer(list):
+
+    def __init__(self, name=""):
+        list.__init__(self, [""])
+        self.name = name
+        self.number = 1
+        self.options = {"modifiable": True}
+        self.vars = {}
+
+    def append(self, lines, nr=None):
+        if not isinstance(lines, list):
+            lines = [lines]
+        if nr is None:
+            self.extend(lines)
+        else:
+            self[nr:nr] = lines
+
+    def __delslice__(self, i, j):
+        list.__delslice__(self, i, j)
+        if len(self) == 0:  # vim buffers always have a line
+            list.append(self, "")
+
+
+class Window(object):
+
+    def __init__(self, height):
+        self.height = height
+        self.cursor = (1, 0)
+
+
+class Current(object):
+
+    def __init__(self, height):
+        self.buffer = Buffer()
+        self.window = Window(height)
+
+    @property
+    def line(self):
+        return self.buffer[self.window.cursor[0] - 1]
+
+
+class FakeVim(types.ModuleType):
+    """ The parts of the vim module vim-pad uses.
+
+    keys: the characters getchar() returns, in order ("\\r" is Enter).
+    on_getchar: called before each getchar(), e.g. to time keystrokes.
+    typeahead: whether the keys count as already typed (getchar(0) returns
+    them), as when typing faster than vim-pad searches.
+    """
+
+    def __init__(self, settings, cwd, features):
+        types.ModuleType.__init__(self, "vim")
+        self.settings = settings
+        self.cwd = cwd
+        self.features = features
+        self.current = Current(int(settings["pad#window_height"]))
+        self.buffers = [self.current.buffer]
+        self.windows = [self.current.window]
+        self.timers = []
+        self.commands = []
+        self.keys = []
+        self.on_getchar = None
+        self.typeahead = False
+
+    def new_buffer(self, name):
+        self.current.buffer = Buffer(name)
+        self.buffers = [self.current.buffer]
+
+    def eval(self, expr):
+        if expr.startswith("[filter(copy(g:)"):
+            return [self.settings, self.cwd, self.features]
+        if expr == "getchar()":
+            if self.on_getchar is not None:
+                self.on_getchar()
+            return str(ord(self.keys.pop(0))) if self.keys else "27"
+        if expr == "getchar(0)":
+            return str(ord(self.keys.pop(0))) if self.typeahead and self.keys else "0"
+        if expr == "getchar(1)":
+            return "1" if self.typeahead and self.keys else "0"
+        if expr.startswith("nr2char("):
+            return chr(int(expr[len("nr2char("):-1]))
+        if expr.startswith("executable("):
+            return "1" if find_executable(expr.split("'")[1]) else "0"
+        if expr.startswith("bufexists("):
+            return "1" if self.current.buffer.name == "__pad__" else "0"
+        if expr == "b:pad_query":
+            return self.current.buffer.vars.get("pad_query", "")
+        if expr == "&modifiable":
+            return "1" if self.current.buffer.options["modifiable"] else "0"
+        if expr.startswith("input("):
+            return "y"
+        return "0"
+
+    def command(self, cmd):
+        self.commands.append(cmd)
+        if "new __pad__" in cmd:
+            self.new_buffer("__pad__")
+        elif cmd == "normal! dd":
+            del self.current.buffer[0]
+            if len(self.current.buffer) == 0:
+                self.current.buffer.append("")
+        elif cmd.startswith("let b:pad_query = "):
+            self.current.buffer.vars["pad_query"] = cmd.split("'")[1]
+        elif cmd.startswith("setlocal modifiable"):
+            self.current.buffer.options["modifiable"] = True
+        elif cmd.startswith("setlocal nomodifiable"):
+            self.current.buffer.options["modifiable"] = False
+        elif cmd.startswith("call timer_start(0, function('pad#RenderMore'"):
+            self.timers.append(int(cmd.split("[")[1].split("]")[0]))
+
+    def run_timers(self):
+        """ Runs the pending timers, like vim does when it's idle.
+        """
+        from vim_pad import handler
+        while self.timers:
+            handler.render_more(self.timers.pop(0))
+
+
+def install_vim(save_dir, timers=True, **settings):
+    """ Puts a FakeVim for a vim-pad using save_dir in sys.modules, and
+    returns it. settings override DEFAULT_SETTINGS.
+    """
+    values = dict(DEFAULT_SETTINGS, dir=save_dir, **settings)
+    vim = FakeVim(dict(("pad#" + k, v) for k, v in values.iteritems()),
+                  os.getcwd(), ["1" if timers else "0", "0"])
+    sys.modules["vim"] = vim
+    return vim
+
+
+def new_session():
+    """ Forgets everything vim-pad keeps in memory, as if vim was restarted,
+    and imports it again.
+    """
+    for name in [n for n in sys.modules if n == "vim_pad" or n.startswith("vim_pad.")]:
+        del sys.modules[name]
+    gc.collect()
+    import vim_pad
+    return vim_pad
+
+
+def list_notes(vim):
+    """ Runs :ListPads to the end, rendering the whole list.
+    """
+    from vim_pad import handler
+    handler.display("", "")
+    vim.run_timers()
+
+
+# corpus {{{1
+
+WORDS = ("meeting notes project idea todo draft review budget travel recipe "
+         "book paper release bug design garden music vim python shell plan "
+         "weekly monthly report call email friday urgent someday reading").split()
+ORG_TAGS = ("work", "home", "urgent", "reading", "later")
+
+
+def sentence(rng, count):
+    return " ".join(rng.choice(WORDS) for i in xrange(count))
+
+
+def note_text(rng, i):
+    """ Returns the contents of a note: mostly prose with a title, sometimes
+    markdown or org headings, @tags or a modeline, and a few empty notes.
+    """
+    kind = rng.random()
+    if kind < 0.02:
+        return ""
+    title = sentence(rng, rng.randint(2, 7)).capitalize()
+    if kind < 0.15:
+        tags = rng.sample(ORG_TAGS, rng.randint(1, 3))
+        title = "* %s    :%s:" % (title, ":".join(tags))
+    elif kind < 0.35:
+        title = "# " + title
+    lines = [title]
+    if rng.random() < 0.05:
+        lines.insert(0, "vim: set ft=markdown:")
+    # note sizes are skewed: most are short, a few are long
+    size = int(rng.lognormvariate(6, 1.2))
+    while sum(len(l) + 1 for l in lines) < size:
+        line = sentence(rng, rng.randint(4, 14))
+        if rng.random() < 0.1:
+            line += " @" + rng.choice(WORDS)
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+def note_folder(rng):
+    roll = rng.random()
+    if roll < 0.5:
+        return ""
+    if roll < 0.6:
+        return "archive"
+    if roll < 0.85:
+        return rng.choice(WORDS)
+    return os.path.join(rng.choice(WORDS), rng.choice(WORDS))
+
+
+def make_corpus(path, count, seed=0):
+    """ Creates count notes in path, unless it already has a corpus of that
+    size. Modification times are spread over the last two years.
+    """
+    marker = os.path.join(path, ".vim-pad-corpus")
+    if os.path.exists(marker) and open(marker).read() == "%d %d" % (count, seed):
+        return
+    rng = random.Random(seed)
+    now = time.time()
+    for i in xrange(count):
+        folder = os.path.join(path, note_folder(rng))
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        note = os.path.join(folder, "%d%06d" % (1400000000 + i, i))
+        with open(note, "w") as f:
+            f.write(note_text(rng, i))
+        mtime = now - rng.random() * 2 * 365 * 86400
+        os.utime(note, (mtime, mtime))
+    with open(marker, "w") as f:
+        f.write("%d %d" % (count, seed))
+
+
+# measuring {{{1
+
+COUNTED = (
+    (os, "stat"), (os, "lstat"), (os, "listdir"), (os, "open"), (os, "read"),
+    (__builtin__, "open"), (subprocess, "Popen"),
+)
+
+
+class SyscallCounter(object):
+    """ Counts the filesystem calls made while active, by wrapping the os
+    functions (and open, and scandir if installed), also where vim-pad
+    imported them by name.
+
+    vim-pad modules imported while active get the wrappers too; they are
+    restored on exit.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.patched = []
+        self.originals = {}
+
+    def wrap(self, name, function):
+        def counted(*args, **kwargs):
+            self.counts[name] = self.counts.get(name, 0) + 1
+            return function(*args, **kwargs)
+        return counted
+
+    def __enter__(self):
+        targets = list(COUNTED)
+        try:
+            import scandir
+            targets.append((scandir, "scandir"))
+        except ImportError:
+            pass
+        if hasattr(os, "scandir"):
+            targets.append((os, "scandir"))
+        modules = [m for n, m in sys.modules.items()
+                   if m is not None and (n == "vim_pad" or n.startswith("vim_pad."))]
+        for owner, name in targets:
+            original = getattr(owner, name)
+            wrapper = self.wrap(name, original)
+            self.originals[wrapper] = original
+            for module in [owner] + modules:
+                if module.__dict__.get(name) is original:
+                    self.patched.append((module, name, original))
+                    setattr(module, name, wrapper)
+        return self
+
+    def __exit__(self, *exc):
+        for module, name, original in reversed(self.patched):
+            setattr(module, name, original)
+        self.patched = []
+        for name, module in sys.modules.items():
+            if module is not None and name.startswith("vim_pad."):
+                for attr, value in module.__dict__.items():
+                    if callable(value) and value in self.originals:
+                        setattr(module, attr, self.originals[value])
+        self.originals = {}
+
+
+def reset_peak():
+    """ Resets the peak RSS of the process, if the system lets us. Returns
+    whether it did.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except (IOError, OSError):
+        return False
+
+
+def peak_rss():
+    """ Returns the peak RSS of the process, in MB.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except IOError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024 if sys.platform == "darwin" else 1024.0)
+
+
+class Result(object):
+
+    def __init__(self, name, seconds, peak, counts, value):
+        self.name = name
+        self.seconds = seconds
+        self.peak = peak
+        self.counts = counts
+        self.value = value
+
+    def format(self):
+        calls = " ".join("%s=%d" % item for item in sorted(self.counts.items()))
+        return "%-28s %9.1fms %8.1fMB  %s" % (self.name, self.seconds * 1000,
+                                             self.peak, calls)
+
+
+def measure(name, function, *args):
+    """ Calls function, and returns a Result with the time it took, the peak
+    RSS of the process while it ran and the filesystem calls it made.
+    """
+    gc.collect()
+    reset_peak()
+    with SyscallCounter() as counter:
+        start = time.time()
+        value = function(*args)
+        seconds = time.time() - start
+    return Result(name, seconds, peak_rss(), counter.counts, value)
+# vim: set fdm=marker :
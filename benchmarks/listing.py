@@ -0,0 +1,133 @@
+# coding=utf-8
+""" Measures listing, searching and sorting notes, outside of vim.
+
+    python2 benchmarks/listing.py [--sizes 1000,10000,100000] [--query QUERY]
+                                  [--backend grep|internal|...] [--dir DIR]
+
+For each size, a corpus of notes is generated in DIR (a temporary directory
+by default; an existing corpus of the same size in DIR is reused), and each
+operation is reported with its time, the peak RSS of the process while it ran
+and the filesystem calls it made:
+
+  list cold         :ListPads in a new session, without an index file (or
+                    note database)
+  list warm index   :ListPads in a new session, with the index file
+  list first page   :ListPads again, until the first window of notes is shown
+  list warm         :ListPads again, to the end
+  list top 100      :ListPads again, with g:pad#max_listed = 100
+  parse all         PadInfo for every note
+  get_filelist      a search for QUERY
+  key N             typing the Nth character of QUERY in the list search
+  type fast         typing QUERY faster than it can be searched
+  sort title/tags   <S-s> in the list
+  move 10           +f on a visual selection of 10 notes, and -f to move
+                    them back
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import harness
+
+
+def type_query(vim, query, typeahead=False):
+    """ Types query in the list's incremental search, and returns the time
+    each keystroke took to be handled.
+    """
+    from vim_pad import list_local
+    stamps = []
+    vim.keys = list(query) + ["\x1b"]
+    vim.on_getchar = lambda: stamps.append(time.time())
+    vim.typeahead = typeahead
+    try:
+        list_local.incremental_search()
+    finally:
+        vim.on_getchar = None
+        vim.typeahead = False
+    return [b - a for a, b in zip(stamps, stamps[1:])]
+
+
+def run(save_dir, count, args):
+    results = []
+    vim = harness.install_vim(save_dir, search_backend=args.backend)
+
+    for name in (".vim-pad-index", ".vim-pad.sqlite"):
+        if os.path.exists(os.path.join(save_dir, name)):
+            os.remove(os.path.join(save_dir, name))
+    harness.new_session()
+    results.append(harness.measure("list cold", harness.list_notes, vim))
+
+    harness.new_session()
+    results.append(harness.measure("list warm index", harness.list_notes, vim))
+
+    from vim_pad import handler, pad
+    results.append(harness.measure("list first page", handler.display, "", ""))
+    vim.timers = []
+    results.append(harness.measure("list warm", harness.list_notes, vim))
+    vim.settings["pad#max_listed"] = "100"
+    results.append(harness.measure("list top 100", harness.list_notes, vim))
+    vim.settings["pad#max_listed"] = "0"
+
+    paths = [path for path, st in handler.stat_records(handler.get_filerecords("!"))]
+    results.append(harness.measure("parse all", pad.parse_many, paths))
+
+    results.append(harness.measure("get_filelist %r" % args.query,
+                                   handler.get_filelist, args.query))
+
+    harness.list_notes(vim)
+    typed = harness.measure("type %r" % args.query, type_query, vim, args.query)
+    results.append(typed)
+    for i, seconds in enumerate(typed.value):
+        results.append(harness.Result("  key %d (%r)" % (i + 1, args.query[i]),
+                                      seconds, typed.peak, {}, None))
+
+    harness.list_notes(vim)
+    results.append(harness.measure("type fast %r" % args.query, type_query, vim,
+                                   args.query, True))
+
+    from vim_pad import list_local
+    for key, name in (("1", "title"), ("2", "tags")):
+        harness.list_notes(vim)
+        results.append(harness.measure("sort " + name, list_local.sort, key))
+
+    # the notes of the save dir come first when sorted by folder
+    harness.list_notes(vim)
+    list_local.sort("4")
+    results.append(harness.measure("move 10", list_local.move_to_folder,
+                                   "benchmark", 1, 10))
+    harness.list_notes(vim)
+    list_local.sort("4")
+    moved = [i + 1 for i, line in enumerate(handler.shown["lines"])
+             if os.path.dirname(line.path) == os.path.join(save_dir, "benchmark")]
+    results.append(harness.measure("move 10 back", list_local.move_to_savedir,
+                                   moved[0], moved[-1]))
+
+    print "%d notes (%s backend)" % (count, args.backend)
+    for result in results:
+        print "  " + result.format()
+    print
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--query", default="budget")
+    parser.add_argument("--backend", default="grep")
+    parser.add_argument("--dir", help="where to keep the corpora")
+    args = parser.parse_args()
+
+    base = args.dir or tempfile.mkdtemp(prefix="vim-pad-bench-")
+    try:
+        for count in [int(size) for size in args.sizes.split(",")]:
+            save_dir = os.path.join(base, str(count))
+            harness.make_corpus(save_dir, count)
+            run(save_dir, count, args)
+    finally:
+        if not args.dir:
+            shutil.rmtree(base)
+
+
+if __name__ == "__main__":
+    main()
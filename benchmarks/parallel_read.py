@@ -0,0 +1,53 @@
+# coding=utf-8
+""" Compares serial and parallel reads of a cold metadata index.
+
+    python2 benchmarks/parallel_read.py [--notes N] [--workers N] [--latency MS] [--dir DIR]
+
+By default a temporary directory with 10000 notes is created. --latency adds
+a sleep to every open(), to approximate a network filesystem; --dir points the
+benchmark at an existing notes directory (e.g. an NFS mount) instead.
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+import harness
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--notes", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0, help="ms per open()")
+    parser.add_argument("--dir")
+    args = parser.parse_args()
+
+    save_dir = args.dir or tempfile.mkdtemp(prefix="vim-pad-bench-")
+    try:
+        if not args.dir:
+            harness.make_corpus(save_dir, args.notes)
+        harness.install_vim(save_dir)
+        from vim_pad import pad, index
+        from vim_pad.walk import scan_notes
+
+        if args.latency:
+            def slow_open(*a, **kw):
+                time.sleep(args.latency / 1000.0)
+                return open(*a, **kw)
+            pad.open = slow_open
+
+        records = scan_notes(save_dir, "!")
+        for workers in (0, args.workers):
+            metadata = index.MetadataIndex(save_dir)
+            metadata.entries = {}  # cold
+            start = time.time()
+            metadata.lookup_many(records, workers=workers)
+            print "%6d notes, %2d workers: %.3fs" % (len(records), workers, time.time() - start)
+    finally:
+        if not args.dir:
+            shutil.rmtree(save_dir)
+
+
+if __name__ == "__main__":
+    main()
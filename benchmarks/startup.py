@@ -0,0 +1,144 @@
+# coding=utf-8
+""" Measures what vim-pad costs when vim starts, and on first use.
+
+    python2 benchmarks/startup.py [--count 1000] [--dir DIR] [--vim VIM]
+
+Each step runs in a new python process, with a FakeVim (see harness.py), so
+modules are imported as in a new vim session. Times are printed like vim's
+--startuptime, along with the budget for each step:
+
+  import vim_pad    what `python import vim_pad` costs
+  BufLeave          the first time a note is left (pad_local is loaded)
+  load the list     importing the list and search machinery
+  first :Pad ls     the above, and listing COUNT notes with a warm index
+                    (its budget grows with COUNT)
+
+If VIM has python support, `vim --startuptime` is also run, and the time
+spent sourcing vim-pad's scripts is reported. The exit status is 1 if a step
+went over its budget.
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import harness
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# step -> budget, in ms, for a given number of notes
+BUDGETS = (
+    ("import vim_pad", lambda count: 1.0),
+    ("BufLeave", lambda count: 15.0),
+    ("load the list", lambda count: 30.0),
+    ("first :Pad ls", lambda count: 30.0 + count * 0.04),
+)
+
+
+def run_step(step, save_dir):
+    """ Runs step in this process, and returns the time it took, in ms.
+    """
+    vim = harness.install_vim(save_dir)
+    start = time.time()
+    if step == "import vim_pad":
+        import vim_pad
+    elif step == "BufLeave":
+        import vim_pad.pad_local
+        vim_pad.pad_local.update()
+    elif step == "load the list":
+        import vim_pad.list_local
+    elif step == "first :Pad ls":
+        harness.list_notes(vim)
+    return (time.time() - start) * 1000
+
+
+def measure_step(step, save_dir):
+    """ Runs step in a new python process, and returns the time it took and
+    the vim-pad modules it loaded.
+    """
+    output = subprocess.check_output([sys.executable, os.path.abspath(__file__),
+                                      "--step", step, "--dir", save_dir])
+    fields = output.strip().split("\n")[-1].split()
+    return float(fields[0]), fields[1:]
+
+
+def vim_startuptime(vim, save_dir):
+    """ Returns the (elapsed ms, script) lines of vim's --startuptime log for
+    vim-pad's scripts, or None if vim can't run vim-pad.
+    """
+    try:
+        has_python = subprocess.check_output(
+                [vim, "-N", "-u", "NONE", "-i", "NONE", "-es",
+                 "-c", "redir! > /dev/stdout | echo has('python') | redir END | qa!"])
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    if has_python.strip() != "1":
+        return None
+    log = tempfile.mktemp(prefix="vim-pad-startuptime-")
+    try:
+        subprocess.call([vim, "-N", "-u", "NONE", "-i", "NONE", "-es",
+                         "--cmd", "let g:pad#dir = '%s'" % save_dir,
+                         "--cmd", "set rtp^=" + os.path.abspath(ROOT),
+                         "--startuptime", log,
+                         "-c", "runtime plugin/pad.vim", "-c", "qa!"])
+        lines = []
+        with open(log) as f:
+            for line in f:
+                fields = line.split(":", 1)
+                if "pad.vim" in line and len(fields) == 2:
+                    lines.append((float(fields[0].split()[-1]), fields[1].strip()))
+        return lines
+    finally:
+        if os.path.exists(log):
+            os.remove(log)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--dir", help="where to keep the corpus")
+    parser.add_argument("--vim", default="vim")
+    parser.add_argument("--step", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.step:
+        elapsed = run_step(args.step, args.dir)
+        print "%.3f %s" % (elapsed, " ".join(sorted(
+                name for name, module in sys.modules.items()
+                if name.startswith("vim_pad.") and module is not None)))
+        return
+
+    base = args.dir or tempfile.mkdtemp(prefix="vim-pad-bench-")
+    over = False
+    try:
+        save_dir = os.path.join(base, str(args.count))
+        harness.make_corpus(save_dir, args.count)
+        run_step("first :Pad ls", save_dir)  # writes the index, compiles .pyc
+        print "times in msec (%d notes)" % args.count
+        print " elapsed  budget: step"
+        for step, budget in BUDGETS:
+            budget = budget(args.count)
+            elapsed, modules = measure_step(step, save_dir)
+            over = over or elapsed > budget
+            print "%8.3f %7.1f: %s%s" % (elapsed, budget, step,
+                                         "  OVER BUDGET" if elapsed > budget else "")
+            print "                  loads: %s" % (" ".join(
+                    m[len("vim_pad."):] for m in modules) or "-")
+        lines = vim_startuptime(args.vim, save_dir)
+        if lines is None:
+            print "\n%s can't run vim-pad (no +python): --startuptime skipped" % args.vim
+        else:
+            print "\nvim --startuptime"
+            for elapsed, script in lines:
+                print "%8.3f: %s" % (elapsed, script)
+    finally:
+        if not args.dir:
+            shutil.rmtree(base)
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,7 @@ noremap <buffer> <silent> -f :call pad#MovePadToSaveDir()<cr>
 noremap <buffer> <silent> q :bw<cr>
 noremap <buffer> <silent> <S-f> :call pad#IncrementalSearch()<cr>
 noremap <buffer> <silent> <S-s> :call pad#Sort()<cr>
+noremap <buffer> <silent> <S-m> :call pad#LoadMore()<cr>
 if !exists("b:pad_query")
     let b:pad_query = ''
 endif
@@ -73,10 +73,49 @@ endif
 if !exists('g:pad#query_dirnames')
     let g:pad#query_dirnames = 1
 endif
+if !exists('g:pad#search_ranked')
+    let g:pad#search_ranked = 0
+endif
+if !exists('g:pad#async_search')
+    let g:pad#async_search = 0
+endif
+if !exists('g:pad#search_debounce')
+    let g:pad#search_debounce = 0
+endif
+if !exists('g:pad#search_time_budget')
+    let g:pad#search_time_budget = 100
+endif
+if !exists('g:pad#worker_python')
+    let g:pad#worker_python = "python2"
+endif
+if !exists('g:pad#worker_max_memory')
+    let g:pad#worker_max_memory = 256
+endif
 " Display: {{{2
 if !exists('g:pad#read_nchars_from_files')
     let g:pad#read_nchars_from_files = 200
 endif
+if !exists('g:pad#parallel_read')
+    let g:pad#parallel_read = 0
+endif
+if !exists('g:pad#cache_max_entries')
+    let g:pad#cache_max_entries = 0
+endif
+if !exists('g:pad#watch_dirs')
+    let g:pad#watch_dirs = 0
+endif
+if !exists('g:pad#watch_interval')
+    let g:pad#watch_interval = 5
+endif
+if !exists('g:pad#stats')
+    let g:pad#stats = 0
+endif
+if !exists('g:pad#stats_history')
+    let g:pad#stats_history = 20
+endif
+if !exists('g:pad#stats_log')
+    let g:pad#stats_log = ""
+endif
 if !exists('g:pad#highlighting_variant')
     let g:pad#highlighting_variant = 0
 endif
@@ -89,6 +128,15 @@ endif
 if !exists('g:pad#show_dir')
     let g:pad#show_dir = 1
 endif
+if !exists('g:pad#max_listed')
+    let g:pad#max_listed = 0
+endif
+if !exists('g:pad#lazy_render')
+    let g:pad#lazy_render = 1
+endif
+if !exists('g:pad#render_chunk_size')
+    let g:pad#render_chunk_size = 500
+endif
 " Mappings: {{{2
 if !exists('g:pad#set_mappings')
     let g:pad#set_mappings = 1
@@ -112,6 +160,40 @@ if !exists('g:pad#maps#newsilent')
     let g:pad#maps#newsilent = "<leader>s!"
 endif
 
+" Global Settings: {{{1
+"
+" These are set up front in vimscript, so starting vim doesn't load python.
+" The rest of vim-pad is loaded on first use, from autoload/pad.vim.
+if g:pad#dir != ""
+    " To update the date when files are modified
+    augroup pad
+        au!
+        execute "au BufEnter" printf("%s*", g:pad#dir) ":let b:pad_modified = 0"
+        execute "au BufWritePre" printf("%s*", g:pad#dir) ":let b:pad_modified = eval(&modified)"
+        execute "au BufLeave" printf("%s*", g:pad#dir) ":call pad#UpdatePad()"
+        if g:pad#watch_dirs
+            execute "au BufWritePost" printf("%s*", g:pad#dir) ":call pad#TouchNote(expand('<afile>:p'))"
+        endif
+    augroup END
+
+    " vim-pad pollutes the MRU.vim list quite a lot, if let alone.
+    " This should fix that. MRU might be loaded after us, so we wait.
+    function! s:ExcludeFromMRU()
+        if exists(":MRU") == 2
+            let l:tail = g:MRU_Exclude_Files != '' ? '\|' . g:MRU_Exclude_Files : ''
+            let g:MRU_Exclude_Files = '^' . escape(fnamemodify(expand(g:pad#dir), ':p'), '\') . '.*' . l:tail
+        endif
+    endfunction
+    if exists('v:vim_did_enter') && v:vim_did_enter
+        call s:ExcludeFromMRU()
+    else
+        au pad VimEnter * call s:ExcludeFromMRU()
+    endif
+
+    " we forbid writing backups of the notes
+    let &backupskip .= ',' . fnamemodify(expand(g:pad#dir), ':p') . '*'
+endif
+
 " Commands: {{{1
 "
 " Creates a new note
@@ -1,6 +1,7 @@
-import vim_pad.handler
-import vim_pad.list_local
-import vim_pad.pad_local
-import vim_pad.vim_globals
+""" vim-pad's python side.
 
-vim_pad.vim_globals.set_vim_globals()
+Nothing is imported here, so `python import vim_pad` costs nothing: each
+entry point in autoload/pad.vim imports the module it calls, so the listing
+and search machinery is only loaded when it's first used. The autocommands
+and settings vim-pad needs from the start are set in plugin/pad.vim.
+"""
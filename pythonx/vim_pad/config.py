@@ -0,0 +1,68 @@
+import vim
+from functools import wraps
+from os.path import expanduser
+
+# the snapshot for the command being run, if any
+_snapshot = None
+
+
+class Config(object):
+    """ A snapshot of the g:pad#* settings.
+
+    Settings are read as items, without the "pad#" prefix (config["show_dir"]
+    is the value of g:pad#show_dir), as strings, lists or dicts.
+    """
+
+    def __init__(self, settings, cwd, features):
+        self.settings = settings
+        self.cwd = cwd
+        self.has_timers = features[0] == "1"
+        self.has_jobs = features[1] == "1"
+        self.save_dir = expanduser(settings.get("pad#dir", "")).replace("\\", "\\\\")
+        self.local_path = cwd + "/" + settings.get("pad#local_dir", "")
+        self.use_local_dir = settings.get("pad#local_dir", "") != "" \
+                and self.local_path != self.save_dir
+
+    def __getitem__(self, name):
+        return self.settings["pad#" + name]
+
+    def flag(self, name):
+        return bool(int(self[name]))
+
+    def number(self, name):
+        return int(self[name])
+
+
+def read_config():
+    """ Reads the settings from vim, in a single call.
+    """
+    settings, cwd, features = vim.eval(
+        "[filter(copy(g:), 'v:key =~# \"^pad#\"'), getcwd(), "
+        "[has('timers'), has('nvim') || has('job')]]")
+    return Config(settings, cwd, features)
+
+
+def get_config():
+    """ Returns the settings snapshot of the running command. Outside of a
+    command, the settings are read again.
+    """
+    if _snapshot is not None:
+        return _snapshot
+    return read_config()
+
+
+def command(function):
+    """ Decorator for the functions vim calls. The settings are read once when
+    the function starts, and shared by everything it calls.
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        global _snapshot
+        if _snapshot is not None:
+            return function(*args, **kwargs)
+        _snapshot = read_config()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _snapshot = None
+    return wrapper
@@ -0,0 +1,370 @@
+# coding=utf-8
+""" A mirror of the notes in a SQLite database, used when
+g:pad#search_backend is "sqlite".
+
+The database is a hidden file inside g:pad#dir. Its notes table has, for each
+note under g:pad#dir and the local dir, its (mtime, size, inode) signature and
+the data shown in the list, and an FTS5 table with the trigram tokenizer holds
+their contents. Notes are only read when their signature changes. Searches,
+tag queries and sorts are each a single SQL statement.
+
+A NoteDatabase takes the place of the metadata index (see index.py): it has
+the methods of MetadataIndex the list uses, so the notes listed are read once
+for both. It is safe to delete the database; it will be rebuilt the next time
+the notes are listed, and it is rebuilt when the settings the notes were
+parsed with (g:pad#read_nchars_from_files and g:pad#title_first_line) change.
+"""
+import os
+from os.path import join, abspath, sep
+try:
+    import sqlite3
+except ImportError:  # python built without sqlite
+    sqlite3 = None
+from vim_pad.walk import signature
+from vim_pad.index import NoteEntry
+from vim_pad.pad import PadInfo, read_notes, note_tags, parse_options, note_folder
+from vim_pad.search_index import is_literal, in_archive, compile_query, matching_lines
+from vim_pad.config import get_config
+from vim_pad.stats import phase, add_count
+
+DATABASE_FILENAME = ".vim-pad.sqlite"
+DATABASE_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE notes (id INTEGER PRIMARY KEY, path TEXT UNIQUE, root TEXT,
+                    mtime REAL, size INTEGER, inode INTEGER, archived INTEGER,
+                    folder TEXT, summary TEXT, body TEXT, tags TEXT,
+                    is_empty INTEGER);
+CREATE VIRTUAL TABLE notes_text USING fts5(text, tokenize = "trigram");
+CREATE TABLE parsed_with (nchars INTEGER, title_first_line INTEGER);
+"""
+
+# the ORDER BY clauses for handler.SORT_KEYS
+SORT_ORDERS = {
+        "title": "is_empty, summary",
+        "tags": "tags = '', tags",
+        "date": "mtime DESC",
+        "folder": "folder, mtime DESC",
+        "size": "size DESC",
+        }
+
+
+class DatabaseError(Exception):
+    pass
+
+
+class NoteDatabase(object):
+
+    def __init__(self, save_dir, parsed_with):
+        self.save_dir = abspath(save_dir)
+        # the (nchars, title_first_line) settings the entries were parsed with
+        self.parsed_with = parsed_with
+        self.path = join(self.save_dir, DATABASE_FILENAME)
+        self.entries = {}  # path -> NoteEntry
+        self.rows = {}     # path -> (id, root)
+        self.hits = 0
+        self.misses = 0
+        self.connection = None
+        self.open()
+
+    def open(self):
+        """ Opens the database, creating it if it is missing or out of date,
+        and loads the entries of the notes.
+        """
+        connection = sqlite3.connect(self.path, timeout=5)
+        connection.text_factory = str
+        nchars, title_first_line = self.parsed_with
+        if connection.execute("PRAGMA user_version").fetchone()[0] != DATABASE_VERSION or \
+                connection.execute("SELECT nchars, title_first_line FROM parsed_with"
+                                   ).fetchone() != (nchars, int(title_first_line)):
+            connection.executescript("DROP TABLE IF EXISTS notes;"
+                                     "DROP TABLE IF EXISTS notes_text;"
+                                     "DROP TABLE IF EXISTS parsed_with;" + SCHEMA +
+                                     "PRAGMA user_version = %d;" % DATABASE_VERSION)
+            with connection:
+                connection.execute("INSERT INTO parsed_with VALUES (?, ?)",
+                                   (nchars, int(title_first_line)))
+        # it can be rebuilt, so we don't wait for the disk
+        connection.execute("PRAGMA synchronous = OFF")
+        for row in connection.execute(
+                "SELECT id, path, root, mtime, size, inode, folder, summary, body, "
+                "tags, is_empty FROM notes"):
+            note_id, path, root, mtime, size, inode, folder, summary, body, tags, is_empty = row
+            self.rows[path] = (note_id, root)
+            self.entries[path] = NoteEntry((mtime, size, inode), summary, body, intern(folder),
+                                           tuple(intern(tag) for tag in tags.split()),
+                                           bool(is_empty))
+        self.connection = connection
+
+    def key(self, path):
+        return path
+
+    def save(self):
+        """ Commits the pending changes, if any.
+        """
+        self.connection.commit()
+
+    def store(self, path, root, st, info, text):
+        """ Sets the entry and the text of the note in path.
+        """
+        tags = sorted(note_tags(info, text))
+        text = text.decode("utf-8", "replace")
+        entry = NoteEntry(signature(st), info.summary, info.body, intern(info.folder),
+                          tuple(intern(tag) for tag in tags), info.isEmpty)
+        values = (path, root, st.st_mtime, st.st_size, st.st_ino,
+                  in_archive(root, path), entry.folder, entry.summary, entry.body,
+                  " ".join(tags), entry.isEmpty)
+        row = self.rows.get(path)
+        if row is None:
+            note_id = self.connection.execute(
+                    "INSERT INTO notes (path, root, mtime, size, inode, archived, folder, "
+                    "summary, body, tags, is_empty) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    values).lastrowid
+            self.connection.execute("INSERT INTO notes_text (rowid, text) VALUES (?, ?)",
+                                    (note_id, text))
+        else:
+            note_id = row[0]
+            self.connection.execute(
+                    "UPDATE notes SET path = ?, root = ?, mtime = ?, size = ?, inode = ?, "
+                    "archived = ?, folder = ?, summary = ?, body = ?, tags = ?, "
+                    "is_empty = ? WHERE id = ?", values + (note_id,))
+            self.connection.execute("UPDATE notes_text SET text = ? WHERE rowid = ?",
+                                    (text, note_id))
+        self.rows[path] = (note_id, root)
+        self.entries[path] = entry
+        return entry
+
+    def forget(self, path):
+        """ Removes the note in path, if it is in the database.
+        """
+        row = self.rows.pop(path, None)
+        if row is None:
+            return
+        del self.entries[path]
+        self.connection.execute("DELETE FROM notes WHERE id = ?", (row[0],))
+        self.connection.execute("DELETE FROM notes_text WHERE rowid = ?", (row[0],))
+
+    def rename(self, old_path, new_path):
+        """ Moves the note in old_path to new_path, so a moved note isn't
+        read again. Returns its new entry, or None if it wasn't in the
+        database.
+        """
+        row = self.rows.pop(old_path, None)
+        if row is None:
+            return None
+        note_id, root = row
+        if abspath(new_path).startswith(self.save_dir + sep):
+            root = self.save_dir
+        entry = self.entries.pop(old_path)._replace(folder=intern(note_folder(new_path)))
+        self.connection.execute(
+                "UPDATE notes SET path = ?, root = ?, archived = ?, folder = ? WHERE id = ?",
+                (new_path, root, in_archive(root, new_path), entry.folder, note_id))
+        self.rows[new_path] = (note_id, root)
+        self.entries[new_path] = entry
+        return entry
+
+    def root(self, path):
+        """ Returns the root the note in path is under.
+        """
+        if abspath(path).startswith(self.save_dir + sep):
+            return self.save_dir
+        return abspath(get_config().local_path)
+
+    def update(self, records, root=None, options=None, workers=0):
+        """ Reads the notes in records, (path, stat) pairs, into the database.
+
+        root: the folder they are under, if known.
+
+        Returns the paths of the notes that couldn't be read.
+        """
+        if options is None:
+            options = parse_options()
+
+        notes = read_notes(records, options, workers)
+
+        unreadable = []
+        with phase("parse"):
+            for (path, st), note in zip(records, notes):
+                if note is None:
+                    unreadable.append(path)
+                    continue
+                head, text = note
+                self.store(path, root or self.root(path), st,
+                           PadInfo(head, path, options), text)
+        return unreadable
+
+    def sync(self, root, records):
+        """ Brings the notes under root up to date with records, the (path,
+        stat) list of all of them, archived ones included.
+        """
+        root = abspath(root)
+        stale = []
+        listed = set()
+        for path, st in records:
+            listed.add(path)
+            entry = self.entries.get(path)
+            if entry is None or entry.signature != signature(st):
+                stale.append((path, st))
+        for path in [p for p, row in self.rows.iteritems() if row[1] == root and p not in listed]:
+            self.forget(path)
+        for path in self.update(stale, root):
+            self.forget(path)
+        self.save()
+
+    def lookup_many(self, records, options=None, workers=0):
+        """ Returns the NoteEntry for each (path, stat) record, in order,
+        like MetadataIndex.lookup_many. Notes that changed are read again.
+        """
+        if options is None:
+            options = parse_options()
+        stale = []
+        for path, st in records:
+            entry = self.entries.get(path)
+            if entry is None or entry.signature != signature(st):
+                stale.append((path, st))
+        self.hits += len(records) - len(stale)
+        self.misses += len(stale)
+        add_count("index hits", len(records) - len(stale))
+        add_count("index misses", len(stale))
+        unreadable = set(self.update(stale, options=options, workers=workers))
+        return [self.entries[path] if path not in unreadable else
+                NoteEntry(signature(st), "", "", intern(note_folder(path, options)), (), True)
+                for path, st in records]
+
+    def prune(self, paths, archive=None):
+        """ Removes the notes under the save dir that are not in paths, like
+        MetadataIndex.prune.
+        """
+        listed = set(paths)
+        for path, row in self.rows.items():
+            if row[1] != self.save_dir or path in listed:
+                continue
+            if archive != "!" and in_archive(self.save_dir, path):
+                continue
+            self.forget(path)
+
+    def tagged(self, tags):
+        """ Returns the paths of the notes that have all of tags.
+        """
+        if tags == []:
+            return set()
+        sql = "SELECT path FROM notes WHERE " + \
+                " AND ".join(["instr(' ' || tags || ' ', ?) > 0"] * len(tags))
+        return set(row[0] for row in self.connection.execute(
+                sql, [" %s " % tag.lower() for tag in tags]))
+
+    def matches(self, roots, query, archive, ignorecase, columns):
+        """ Returns the rows (with columns) of the notes under roots whose
+        text matches query, newest first.
+
+        Literal queries of three characters or more are looked up in the
+        trigram index; other queries are matched with python's re.
+        """
+        regex = compile_query(query, ignorecase)
+        if regex is None:
+            return []
+        sql = ["SELECT %s FROM notes JOIN notes_text ON notes_text.rowid = notes.id "
+               "WHERE notes.root IN (%s)" % (columns, ", ".join("?" * len(roots)))]
+        params = [abspath(root) for root in roots]
+        if archive != "!":
+            sql.append("AND NOT notes.archived")
+        text = query.decode("utf-8", "replace")
+        if is_literal(query) and len(text) >= 3:
+            # the trigram index ignores case
+            sql.append("AND notes_text MATCH ?")
+            params.append('"%s"' % text.replace('"', '""'))
+            if not ignorecase:
+                sql.append("AND instr(notes_text.text, ?) > 0")
+                params.append(text)
+        else:
+            self.connection.create_function(
+                    "regexp", 2, lambda pattern, value: regex.search(value) is not None)
+            sql.append("AND notes_text.text REGEXP ?")
+            params.append(text)
+        sql.append("ORDER BY notes.mtime DESC")
+        return self.connection.execute(" ".join(sql), params).fetchall()
+
+    def search(self, roots, query, archive, ignorecase):
+        """ Returns the notes under roots whose contents match query.
+
+        archive: if it is not "!", archived notes are excluded.
+        """
+        return [row[0] for row in self.matches(roots, query, archive, ignorecase,
+                                               "notes.path")]
+
+    def search_lines(self, roots, query, archive, ignorecase, max_lines):
+        """ Like search, but returns a dict mapping each note to up to
+        max_lines of its matching (lineno, line) pairs, as ranking.rank
+        wants them.
+        """
+        regex = compile_query(query, ignorecase)
+        return dict((path, matching_lines(text.decode("utf-8"), regex, max_lines))
+                    for path, text in self.matches(roots, query, archive, ignorecase,
+                                                   "notes.path, notes_text.text"))
+
+    def order(self, paths, key):
+        """ Returns paths sorted by key, one of SORT_ORDERS. Notes that are
+        not in the database go last.
+        """
+        with self.connection:
+            self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS listed (path TEXT)")
+            self.connection.execute("DELETE FROM temp.listed")
+            self.connection.executemany("INSERT INTO temp.listed VALUES (?)",
+                                        ((path,) for path in paths))
+            ordered = [row[0] for row in self.connection.execute(
+                    "SELECT path FROM temp.listed JOIN notes USING (path) ORDER BY " +
+                    SORT_ORDERS[key])]
+        known = set(ordered)
+        return ordered + [path for path in paths if path not in known]
+
+    def stats(self):
+        """ Returns the same stats as MetadataIndex.stats, and the size of
+        the database file.
+        """
+        text = sum(len(e.summary) + len(e.body) for e in self.entries.itervalues())
+        folders = set(e.folder for e in self.entries.itervalues())
+        tags = set(tag for e in self.entries.itervalues() for tag in e.tags)
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        return {"entries": len(self.entries), "max_entries": 0,
+                "text_bytes": text, "folders": len(folders), "tags": len(tags),
+                "hits": self.hits, "misses": self.misses, "evictions": 0,
+                "file_bytes": size}
+
+
+_databases = {}
+
+
+def get_database(save_dir):
+    """ Returns the NoteDatabase for save_dir, opening it on first use.
+
+    Raises DatabaseError the first time if it can't be used (no sqlite3
+    module, or a SQLite without FTS5 or its trigram tokenizer), and returns
+    None afterwards.
+
+    If the settings that change how notes are parsed changed, the database
+    is opened again, and rebuilt.
+    """
+    options = parse_options()
+    parsed_with = (options.nchars, bool(options.title_first_line))
+    if save_dir in _databases:
+        database = _databases[save_dir]
+        if database is None or database.parsed_with == parsed_with:
+            return database
+        database.connection.close()
+        del _databases[save_dir]
+    _databases[save_dir] = None
+    if sqlite3 is None:
+        raise DatabaseError("this python has no sqlite3 module")
+    path = join(abspath(save_dir), DATABASE_FILENAME)
+    for attempt in range(2):
+        try:
+            _databases[save_dir] = NoteDatabase(save_dir, parsed_with)
+            return _databases[save_dir]
+        except sqlite3.Error as error:
+            # a corrupt database is rebuilt
+            if attempt == 0 and os.path.exists(path):
+                os.remove(path)
+    raise DatabaseError("can't use %s with SQLite %s: %s" % (path, sqlite3.sqlite_version, error))
@@ -4,20 +4,69 @@
 # imports {{{1
 import vim
 import re
-from glob import glob
-from os import walk
-from os.path import join, getmtime, isfile, isdir, exists
+import time
+from collections import namedtuple
+from fnmatch import fnmatchcase
+from heapq import heapify, heappop
+from itertools import chain
+from os import stat, listdir
+from os.path import join, isdir, relpath, normpath, sep
+from stat import S_ISREG
 from subprocess import Popen, PIPE
+from vim_pad.walk import scan_notes, is_listed
 from vim_pad.utils import get_save_dir
-from vim_pad.pad import PadInfo
-from vim_pad.timestamps import natural_timestamp
+from vim_pad.config import get_config, command
+from vim_pad.pad import PadInfo, parse_options
+from vim_pad.index import get_index
+from vim_pad.search_index import get_search_index, is_literal
+from vim_pad.timestamps import mtime_timestamp
+from vim_pad.ranking import MAX_LINES, parse_output, compile_query, rank
+from vim_pad.stats import operation, phase, add_count, history
+
+# a query made only of tags, like "@work @urgent"
+TAG_QUERY_RE = re.compile(r"^@\w+(\s+@\w+)*$")
+
+# a note in the list: its path, its mtime, its index entry and, for ranked
+# searches, the matching line to show. The text is built when it is shown,
+# so the timestamp can be updated without parsing it and the notes' data
+# isn't kept twice
+ListLine = namedtuple("ListLine", "path mtime entry snippet")
 
 # globals (caches) {{{1
 cached_data = []
 cached_timestamps = []
 cached_filenames = []
+cached_source = None
+cached_unlisted = {"records": [], "heap": False, "limit": 0}
+cached_store = None
+query_cache = {}
+# the state of the last asynchronous search
+async_search = {"id": 0, "files": [], "seen": set(), "running": False,
+                "close_if_empty": False}
+# the notes of the last listing that are still to be added to the buffer
+pending_render = {"id": 0, "files": [], "lines": [], "cache": None,
+                  "snippets": None}
+# the records of the last listing that combined the save and local dirs
+combined_records = (None, None, None)
+# the notes of the last listing left out by g:pad#max_listed: a heap of
+# (-mtime, path, stat), or a list of (path, stat) for custom orders, and the
+# setting it was listed with
+unlisted = {"records": [], "heap": False, "limit": 0}
+# the ListLines for each line of the __pad__ buffer, while they match it, and
+# whether the listing included the archive
+shown = {"buffer": None, "lines": [], "archive": None}
+
+# how the list can be sorted, as keys on its ListLines
+SORT_KEYS = {
+        "title": lambda line: (line.entry.isEmpty, line.entry.summary),
+        "tags": lambda line: (line.entry.tags == (), sorted(line.entry.tags)),
+        "date": lambda line: -line.mtime,
+        "folder": lambda line: (line.entry.folder, -line.mtime),
+        "size": lambda line: -line.entry.signature[1],
+        }
 
 
+@command
 def open_pad(path=None, first_line="", query=''):  # {{{1
     """Creates or opens a note.
 
@@ -36,18 +85,18 @@ def open_pad(path=None, first_line="", query=''):  # {{{1
     # if no path is provided, we create one using the current time
     if not path:
         path = join(get_save_dir(),
-                    PadInfo([first_line]).id + vim.eval("g:pad#default_file_extension"))
+                    PadInfo([first_line]).id + get_config()["default_file_extension"])
     path = path.replace(" ", "\ ")
 
     def split_for_pad():
-        if vim.eval('g:pad#position["pads"]') == 'right':
+        if get_config()["position"]["pads"] == 'right':
             vim.command("silent! rightbelow"
-                    + str(vim.eval("g:pad#window_width")) + "vsplit " + path)
+                    + get_config()["window_width"] + "vsplit " + path)
         else:
             vim.command("silent! botright"
-                    + str(vim.eval("g:pad#window_height")) + "split " + path)
+                    + get_config()["window_height"] + "split " + path)
 
-    if bool(int(vim.eval("g:pad#open_in_split"))):
+    if get_config().flag("open_in_split"):
         split_for_pad()
     else:
         awa = int(vim.eval("&autowriteall"))
@@ -70,7 +119,7 @@ def open_pad(path=None, first_line="", query=''):  # {{{1
 
     # set the filetype to our default
     if vim.eval('&filetype') in ('', 'conf'):
-        vim.command("set filetype=" + vim.eval("g:pad#default_format"))
+        vim.command("set filetype=" + get_config()["default_format"])
 
     # map the local commands
     if bool(int(vim.eval('has("gui_running")'))):
@@ -91,33 +140,51 @@ def open_pad(path=None, first_line="", query=''):  # {{{1
 
     # highlight query and jump to it?
     if query != '':
-        if vim.eval('g:pad#highlight_query') == '1':
+        if get_config().flag("highlight_query"):
             vim.command("call matchadd('PadQuery', '\c"+query+"')")
-        if vim.eval('g:pad#jumpto_query') == '1':
+        if get_config().flag("jumpto_query"):
             vim.command("call search('\c"+query+"')")
 
+@command
 def new_pad(text=None): #{{{1
-    path = join(get_save_dir(), PadInfo([text]).id + vim.eval("g:pad#default_file_extension"))
+    path = join(get_save_dir(), PadInfo([text]).id + get_config()["default_file_extension"])
     with open(path, 'w') as new_note:
         new_note.write(text)
 
+def stat_records(files):  # {{{1
+    """ Returns (path, stat) records for files, a list of paths or records.
+    Paths that are not files anymore are dropped.
+    """
+    records = []
+    with phase("stat"):
+        for f in files:
+            if isinstance(f, tuple):
+                records.append(f)
+                continue
+            try:
+                st = stat(join(get_save_dir(), f))
+            except OSError:
+                continue
+            if S_ISREG(st.st_mode):
+                records.append((join(get_save_dir(), f), st))
+    return records
+
 def listdir_recursive_nohidden(path, archive):  # {{{1
-    matches = []
-    for root, dirnames, filenames in walk(path, topdown=True):
-        for dirname in dirnames:
-            if dirname.startswith('.'):
-                dirnames.remove(dirname)
-            if archive != "!":
-                if dirname == "archive":
-                    dirnames.remove(dirname)
-        matches += [join(root, f) for f in filenames if not f.startswith('.')]
-    return matches
+    return [note for note, st in scan_notes(path, archive)]
 
-def listdir_external(path, archive, query): # {{{1
-    search_backend = vim.eval("g:pad#search_backend")
+def search_command(paths, archive, query, ranked=False): # {{{1
+    """ Returns the command line for the external search backend.
+
+    paths: the directories to search in.
+
+    ranked: whether we want the matching lines, as "path:lineno:line",
+    instead of just the paths of the notes.
+    """
+    search_backend = get_config()["search_backend"]
+    list_flag = ["-H"] if ranked else ["-l"]
     if search_backend == "grep":
         # we use Perl mode for grep (-P), because it is really fast
-        command = ["grep", "-P", "-n", "-r", "-l", query, path + "/"]
+        command = ["grep", "-P", "-n", "-r"] + list_flag + [query] + [path + "/" for path in paths]
         if archive != "!":
             command.append("--exclude-dir=archive")
         command.append('--exclude=.*')
@@ -127,64 +194,406 @@ def listdir_external(path, archive, query): # {{{1
             ack_path = "ack"
         else:
             ack_path = "/usr/bin/vendor_perl/ack"
-        command = [ack_path, query, path, "--noheading", "-l"]
+        command = [ack_path, query] + paths + (["--nogroup"] if ranked else ["--noheading", "-l"])
         if archive != "!":
             command.append("--ignore-dir=archive")
         command.append('--ignore-file=match:/\./')
     elif search_backend == "ag":
         if vim.eval("executable('ag')") == "1":
-            command = ["ag", query, path, "--noheading", "-l"]
+            command = ["ag", query] + paths + (["--nogroup"] if ranked else ["--noheading", "-l"])
             if archive != "!":
                 command.append("--ignore-dir=archive")
     elif search_backend == "pt":
         if vim.eval("executable('pt')") == "1":
-            command = ["pt", "-l", "--nogroup"]
+            command = ["pt", "--nogroup"] + ([] if ranked else ["-l"])
             if archive != "!":
                 command.append("--ignore=archive")
             command.append(query)
-            command.append(path)
+            command.extend(paths)
 
-    if bool(int(vim.eval("g:pad#search_ignorecase"))):
+    if get_config().flag("search_ignorecase"):
         command.append("-i")
 
-    command.append("--max-count=1")
+    command.append("--max-count=" + str(MAX_LINES if ranked else 1))
+    return command
+
+def search_roots(): # {{{1
+    """ Returns the folders searched: g:pad#dir, and the local dir if used.
+    """
+    config = get_config()
+    if config.use_local_dir:
+        return [config.save_dir, config.local_path]
+    return [config.save_dir]
+
+def search_contents(roots, archive, query): # {{{1
+    """ Returns the notes under roots whose contents match query, running a
+    single search for all of them.
+    """
+    if get_config()["search_backend"] == "worker":
+        files = worker_search(roots, archive, query)
+        if files is not None:
+            return files
+    if get_config()["search_backend"] == "sqlite":
+        database = synced_database(roots)
+        if database is not None:
+            return database.search(roots, query, archive,
+                                   get_config().flag("search_ignorecase"))
+    if get_config()["search_backend"] in ("internal", "worker", "sqlite"):
+        files = []
+        for root in roots:
+            files.extend(synced_search_index(root).search(
+                    query, archive, get_config().flag("search_ignorecase")))
+        return files
 
+    command = search_command(roots, archive, query)
     cmd_output = Popen(command, stdout=PIPE, stderr=PIPE).communicate()[0].split("\n")
 
     return list(filter(lambda i: i != "", cmd_output))
 
+def search_worker(): # {{{1
+    """ Returns the SearchWorker for the current settings.
+    """
+    # the worker, like the watcher, is only imported by the ones who use it
+    from vim_pad.search_worker import get_search_worker
+    config = get_config()
+    return get_search_worker(config["worker_python"], config.number("worker_max_memory"),
+                             config.number("watch_interval"))
+
+def worker_search(roots, archive, query, max_lines=0): # {{{1
+    """ Runs a search in the search worker (see SearchWorker.search).
+
+    If the worker fails, it is reported and None is returned; the search is
+    then done in vim, as with the "internal" backend.
+    """
+    from vim_pad.search_worker import WorkerError
+    worker = search_worker()
+    if worker.backing_off():  # reported when it timed out
+        return None
+    try:
+        return worker.search(roots, archive, query,
+                             get_config().flag("search_ignorecase"),
+                             get_config().flag("watch_dirs"), max_lines)
+    except WorkerError as error:
+        vim.command('echom "vim-pad: search worker failed (' +
+                    str(error).replace('"', "'") + '), searching in vim"')
+        return None
+
+def note_database(): # {{{1
+    """ Returns the NoteDatabase for g:pad#dir, or None if it can't be used.
+
+    The first time it fails, it is reported; the metadata index and the
+    "internal" search backend are used instead.
+    """
+    # only the ones who use it load the database (and sqlite3)
+    from vim_pad.database import get_database, DatabaseError
+    try:
+        return get_database(get_save_dir())
+    except DatabaseError as error:
+        vim.command('echom "vim-pad: ' + str(error).replace('"', "'") +
+                    ', using the internal backend"')
+        return None
+
+def synced_database(roots): # {{{1
+    """ Returns the NoteDatabase, up to date with the notes under roots, or
+    None if it can't be used.
+    """
+    database = note_database()
+    if database is not None:
+        for root in roots:
+            if get_config().flag("watch_dirs"):
+                database.sync(root, watched_notes(root).notes("!"))
+            else:
+                database.sync(root, scan_notes(root, "!"))
+    return database
+
+def metadata_store(): # {{{1
+    """ Returns where the data shown for each note is kept: the metadata
+    index or, with the "sqlite" backend, the note database.
+    """
+    if get_config()["search_backend"] == "sqlite":
+        database = note_database()
+        if database is not None:
+            return database
+    return get_index(get_save_dir())
+
+def watched_notes(root): # {{{1
+    """ Returns the WatchedNotes for root.
+    """
+    # imported here, so vim-pad only loads the watcher (and ctypes) when
+    # g:pad#watch_dirs is set
+    from vim_pad.watcher import get_watched_notes, close_watched_notes
+    # each folder vim goes to has its own local dir; we only watch the
+    # current one
+    close_watched_notes(search_roots())
+    return get_watched_notes(root, get_config().number("watch_interval"))
+
+def synced_search_index(path): # {{{1
+    """ Returns the SearchIndex for path, up to date with the notes the
+    listing would show (including archived ones, which are filtered by the
+    index itself).
+    """
+    index = get_search_index(path)
+    if get_config().flag("watch_dirs"):
+        index.sync(watched_notes(path))
+    else:
+        index.refresh(scan_notes(path, "!"))
+    return index
+
+def search_lines(roots, archive, query): # {{{1
+    """ Returns a dict mapping the notes under roots that match query to
+    their matching (lineno, line) pairs, for ranked searches.
+    """
+    if get_config()["search_backend"] == "worker":
+        found = worker_search(roots, archive, query, MAX_LINES)
+        if found is not None:
+            return found
+    if get_config()["search_backend"] == "sqlite":
+        database = synced_database(roots)
+        if database is not None:
+            return database.search_lines(roots, query, archive,
+                                         get_config().flag("search_ignorecase"), MAX_LINES)
+    if get_config()["search_backend"] in ("internal", "worker", "sqlite"):
+        found = {}
+        for root in roots:
+            found.update(synced_search_index(root).search_lines(
+                    query, archive, get_config().flag("search_ignorecase"), MAX_LINES))
+        return found
+    command = search_command(roots, archive, query, ranked=True)
+    return parse_output(Popen(command, stdout=PIPE, stderr=PIPE).communicate()[0])
+
+def ranked_search(query, archive=None): # {{{1
+    """ Returns the (path, stat) records of the notes matching query, best
+    match first, and a dict with the snippet to show for each.
+
+    The data used to rank the notes comes from the search itself and the
+    metadata index, so matching notes aren't read again.
+    """
+    config = get_config()
+    with phase("search"):
+        matches = search_lines(search_roots(), archive, query)
+        for path in listdir_names(query, archive):
+            matches.setdefault(path, [])
+    add_count("matches", len(matches))
+    records = stat_records(matches)
+    entries = metadata_store().lookup_many(records, parse_options(),
+                                                    config.number("parallel_read"))
+    with phase("sort"):
+        return rank(records, entries, matches,
+                    compile_query(query, config.flag("search_ignorecase")))
+
+def listdir_names(query, archive): # {{{1
+    """ Returns the notes in g:pad#dir whose filename (if g:pad#query_filenames
+    is set) or folder name (if g:pad#query_dirnames is set) match query.
+
+    Both are matched in a single pass over the names at the top of
+    g:pad#dir, like glob("*query*") would; only the matches are stat'ed.
+    """
+    query_filenames = get_config().flag("query_filenames")
+    query_dirnames = get_config().flag("query_dirnames")
+    if not query_filenames and not query_dirnames:
+        return []
+    pattern = "*" + query + "*"
+    files = []
+    try:
+        names = listdir(get_save_dir())
+    except OSError:
+        return []
+    for name in names:
+        if name.startswith(".") or not fnmatchcase(name, pattern):
+            continue
+        path = join(get_save_dir(), name)
+        if isdir(path):
+            if query_dirnames:
+                files.extend(note for note, st in scan_notes(path, archive))
+        elif query_filenames:
+            files.append(path)
+    return files
+
+def list_notes(root, archive):  # {{{1
+    """ Returns the (path, stat) records for the notes under root.
+
+    If g:pad#watch_dirs is set, the records come from a watcher instead of
+    a walk, and the same list is returned while nothing changes. It must not
+    be modified.
+    """
+    config = get_config()
+    with phase("walk"):
+        if config.flag("watch_dirs"):
+            records = watched_notes(root).notes(archive)
+        else:
+            records = scan_notes(root, archive)
+    add_count("notes", len(records))
+    return records
+
+def get_filerecords(archive=None):  # {{{1
+    """ Returns (path, stat) records for all the notes in g:pad#dir (and the
+    local dir, if used), for the walk to be reused by fill_list.
+    """
+    global combined_records
+
+    config = get_config()
+    records = list_notes(config.save_dir, archive)
+    if config.use_local_dir:
+        local_records = list_notes(config.local_path, archive)
+        if combined_records[0] is not records or combined_records[1] is not local_records:
+            combined_records = (records, local_records, records + local_records)
+        records = combined_records[2]
+    return records
+
 def get_filelist(query=None, archive=None):  # {{{1
     """ __get_filelist(query) -> list_of_notes
 
     Returns a list of notes. If no query is provided, all the valid filenames
-    in self.save_dir are returned in a list, otherwise, return the results of
-    grep or ack search for query in self.save_dir.
+    in self.save_dir are returned in a list, otherwise, the notes matching
+    query by contents (in g:pad#dir and the local dir, with a single search)
+    or by file or folder name, each once.
     """
-    local_path = vim.eval("getcwd(). '/'. g:pad#local_dir")
-    use_local_dir = vim.eval('g:pad#local_dir') != '' and local_path != get_save_dir()
     if not query or query == "":
-        files = listdir_recursive_nohidden(get_save_dir(), archive)
+        return [note for note, st in get_filerecords(archive)]
+    files = []
+    seen = set()
+    with phase("search"):
+        for path in chain(search_contents(search_roots(), archive, query),
+                          listdir_names(query, archive)):
+            key = normpath(path)
+            if key not in seen:
+                seen.add(key)
+                files.append(path)
+    add_count("matches", len(files))
+    return files
 
-        if use_local_dir:
-            files.extend(listdir_recursive_nohidden(local_path, archive))
-    else:
-        files = listdir_external(get_save_dir(), archive, query)
+def get_tagged_records(query, archive=None):  # {{{1
+    """ Returns (path, stat) records for the notes that have all the tags in
+    query, a string like "@work @urgent".
 
-        if bool(int(vim.eval("g:pad#query_filenames"))):
-            matches = filter(lambda i: not isdir(i) and i not in files, glob(join(get_save_dir(), "*"+query+"*")))
-            files.extend(matches)
+    The tags come from the metadata index, so only notes that changed since
+    they were last listed are read.
+    """
+    tags = [tag[1:] for tag in query.split()]
+    records = get_filerecords(archive)
+    index = metadata_store()
+    index.lookup_many(records, parse_options(), get_config().number("parallel_read"))
+    index.save()
+    tagged = index.tagged(tags)
+    return [(path, st) for path, st in records if index.key(path) in tagged]
 
-        if bool(int(vim.eval("g:pad#query_dirnames"))):
-            matching_dirs = filter(isdir, glob(join(get_save_dir(), "*"+ query+"*")))
-            for mdir in matching_dirs:
-                files.extend(filter(lambda x: x not in files, listdir_recursive_nohidden(mdir, archive)))
+def reset_query_cache():  # {{{1
+    """ Forgets the results of the previous incremental search.
+    """
+    query_cache.clear()
 
-        if use_local_dir:
-            files.extend(listdir_external(local_path, archive, query))
+def matches_query(path, query):  # {{{1
+    """ Tells whether the note in path would be returned by get_filelist(query).
 
-    return files
+    Only valid for literal queries (see search_index.is_literal).
+    """
+    save_dir = get_save_dir()
+    relative_path = relpath(path, save_dir)
+    if not relative_path.startswith(".."):
+        if get_config().flag("query_filenames") \
+                and sep not in relative_path and query in relative_path:
+            return True
+        if get_config().flag("query_dirnames") \
+                and sep in relative_path and query in relative_path.split(sep)[0]:
+            return True
+    text = None
+    if get_config()["search_backend"] == "internal":
+        if relative_path.startswith(".."):
+            root = get_config().local_path
+        else:
+            root = save_dir
+        text = get_search_index(root).texts.get(path)
+    if text is None:
+        try:
+            with open(path) as note:
+                text = note.read().decode("utf-8", "replace")
+        except IOError:
+            return False
+    query = query.decode("utf-8", "replace")
+    if get_config().flag("search_ignorecase"):
+        return query.lower() in text.lower()
+    return query in text
+
+def incremental_filelist(query, archive=None, interrupted=None):  # {{{1
+    """ Like get_filelist, but reuses the results of previous queries.
+
+    With the "internal" backend, if query is a literal string extending a
+    query we already have results for, its matches are a subset of those, so
+    we only check them, in the texts the backend keeps. Results are cached,
+    so going back to a shorter query costs nothing.
+
+    interrupted: if given, it is called now and then while checking the
+    previous results, and if it returns True the search stops and None is
+    returned.
+    """
+    key = (query, archive)
+    if key in query_cache:
+        return list(query_cache[key])
+    files = None
+    # the other backends search again faster than we can read the notes
+    if is_literal(query) and get_config()["search_backend"] == "internal":
+        for end in range(len(query) - 1, 0, -1):
+            previous = query_cache.get((query[:end], archive))
+            if previous is not None:
+                files = []
+                with phase("search"):
+                    for i, f in enumerate(previous):
+                        if i % 64 == 63 and interrupted is not None and interrupted():
+                            return None
+                        if matches_query(f, query):
+                            files.append(f)
+                add_count("matches", len(files))
+                break
+    if files is None:
+        files = get_filelist(query, archive)
+    query_cache[key] = files
+    return list(files)
+
+def format_line(info, show_dir, snippet=None): # {{{1
+    """ Returns the text shown for a note in the list, after its timestamp.
+
+    info: the note data, as returned by MetadataIndex.lookup_many.
+
+    show_dir: the value of g:pad#show_dir.
+
+    snippet: if given, it is shown instead of the body.
+    """
+    if snippet:
+        info = info._replace(body=snippet)
+    if info.isEmpty:
+        if show_dir:
+            tail = info.folder + u'\u2e25 '.encode('utf-8') + "[EMPTY]"
+        else:
+            tail = "[EMPTY]"
+    else:
+        if show_dir:
+            tail = info.folder + u'\u2e25 '.encode('utf-8') + u'\u21b2'.encode('utf-8').join((info.summary, info.body))
+        else:
+            tail = u'\u21b2'.encode('utf-8').join((info.summary, info.body))
+    return tail
 
-def fill_list(files, queried=False, custom_order=False): # {{{1
+def render_lines(lines): # {{{1
+    """ Returns the text of each ListLine in lines, with natural timestamps.
+    """
+    show_dir = get_config().flag("show_dir")
+    with phase("format"):
+        return [line.path + " @ " + mtime_timestamp(line.mtime).ljust(19) + " │ " +
+                format_line(line.entry, show_dir, line.snippet)
+                for line in lines]
+
+def format_lines(records, index, snippets=None): # {{{1
+    """ Returns a ListLine for each note in records.
+
+    snippets: the lines to show for each note, for ranked searches.
+    """
+    entries = index.lookup_many(records, parse_options(),
+                                get_config().number("parallel_read"))
+    if snippets is None:
+        snippets = {}
+    return [ListLine(pad, st.st_mtime, info, snippets.get(pad))
+            for (pad, st), info in zip(records, entries)]
+
+def fill_list(files, queried=False, custom_order=False, snippets=None): # {{{1
     """ Writes the list of notes to the __pad__ buffer.
 
     files: a list of files to process.
@@ -193,67 +602,332 @@ def fill_list(files, queried=False, custom_order=False): # {{{1
 
     custom_order: whether we should keep the order of the list given (implies queried=True).
 
+    snippets: for ranked searches, a dict with the line to show instead of
+    the body of each note (implies custom_order=True).
+
     Keeps a cache so we only read the notes when the files have been modified.
+
+    If g:pad#lazy_render is set, only the notes that fit in the window are
+    written at first; the rest are added in chunks afterwards (see
+    render_more).
     """
     global cached_filenames, cached_timestamps, cached_data
 
+    cancel_render()
+
+    if snippets is not None:
+        custom_order = True
+
     # we won't want to touch the cache
     if custom_order:
         queried = True
 
-    files = filter(exists, [join(get_save_dir(), f) for f in files])
-
-    timestamps = [getmtime(join(get_save_dir(), f)) for f in files]
+    source = files
+    index = metadata_store()
+    # the lines are out of date if the notes were parsed again with new
+    # settings (see get_index), or the limit changed
+    same_settings = cached_store is index and \
+            cached_unlisted["limit"] == get_config().number("max_listed")
+    if not queried and source is cached_source and same_settings:
+        # the watcher didn't see any change since the last listing
+        records = files = timestamps = None
+    else:
+        records = stat_records(files)
+        files = [pad for pad, st in records]
+        timestamps = [st.st_mtime for pad, st in records]
 
     # we will have a new list only on the following cases
-    if queried or files != cached_filenames or timestamps != cached_timestamps:
-        lines = []
-        if not custom_order:
-            files = reversed(sorted(files, key=lambda i: getmtime(join(get_save_dir(), i))))
-        for pad in files:
-            pad_path = join(get_save_dir(), pad)
-            if isfile(pad_path):
-                pad_path = join(get_save_dir(), pad)
-                with open(pad_path) as pad_file:
-                    info = PadInfo(pad_file)
-                    if info.isEmpty:
-                        if bool(int(vim.eval("g:pad#show_dir"))):
-                            tail = info.folder + u'\u2e25 '.encode('utf-8') + "[EMPTY]"
-                        else:
-                            tail = "[EMPTY]"
-                    else:
-                        if bool(int(vim.eval("g:pad#show_dir"))):
-                            tail = info.folder + u'\u2e25 '.encode('utf-8') + u'\u21b2'.encode('utf-8').join((info.summary, info.body))
-                        else:
-                            tail = u'\u21b2'.encode('utf-8').join((info.summary, info.body))
-                    lines.append(pad + " @ " + tail)
-            else:
-                pass
+    if records is not None and \
+            (queried or files != cached_filenames or timestamps != cached_timestamps or
+             not same_settings):
+        records = limit_listed(records, custom_order)
+        if get_config().flag("lazy_render"):
+            first_page = vim.current.window.height
+        else:
+            first_page = len(records)
+        lines = format_lines(records[:first_page], index, snippets)
 
+        pending_render["files"] = records[first_page:]
+        pending_render["snippets"] = snippets
+        pending_render["lines"] = lines
         # we only update the cache if we are not queried, to preserve the global cache
-        if not queried:
-            cached_data = lines
-            cached_timestamps = timestamps
-            cached_filenames = files
-
-    # update natural timestamps
-    def add_natural_timestamp(matchobj):
-        id_string = matchobj.group("id")
-        mtime = str(int(getmtime(join(get_save_dir(), matchobj.group("id")))*1000000))
-        return id_string + " @ " + natural_timestamp(mtime).ljust(19) + " │"
-
-    if not queried: # we use the cache
-        lines = [re.sub("(?P<id>^.*?) @", add_natural_timestamp, line) for line in cached_data]
-    else: # we use the new values in lines
-        lines = [re.sub("(?P<id>^.*?) @", add_natural_timestamp, line) for line in lines]
-
-    # we now show the list
-    if vim.eval('&modifiable') != '1':
-        vim.current.buffer.options['modifiable'] = True
-    del vim.current.buffer[:] # clear the buffer
-    vim.current.buffer.append(list(lines))
-    vim.command("normal! dd")
+        pending_render["cache"] = None if queried else \
+                (source, files, timestamps, dict(unlisted), index)
+        if pending_render["files"] == []:
+            finish_render()
+    else: # we use the cache
+        lines = cached_data
+        unlisted.update(cached_unlisted)
+
+    write_list(lines)
+
+    if pending_render["files"] != []:
+        if get_config().has_timers:
+            vim.command("call timer_start(0, function('pad#RenderMore', [" +
+                        str(pending_render["id"]) + "]))")
+        else:
+            vim.command("redraw")
+            finish_render()
+
+def limit_listed(records, custom_order): # {{{1
+    """ Returns the records to list: all of them, newest first unless
+    custom_order is set, or only the first g:pad#max_listed ones.
+
+    The notes left out are kept for load_more. For the usual order they are
+    kept in a heap, so the newest notes are found without sorting them all.
+    """
+    limit = unlisted["limit"] = get_config().number("max_listed")
+    if limit <= 0 or limit >= len(records):
+        unlisted["records"], unlisted["heap"] = [], False
+        if custom_order:
+            return records
+        with phase("sort"):
+            return sorted(records, key=lambda r: r[1].st_mtime, reverse=True)
+    if custom_order:
+        unlisted["records"], unlisted["heap"] = list(records), False
+    else:
+        with phase("sort"):
+            heap = [(-st.st_mtime, pad, st) for pad, st in records]
+            heapify(heap)
+        unlisted["records"], unlisted["heap"] = heap, True
+    return take_unlisted(limit)
 
+def take_unlisted(count): # {{{1
+    """ Removes the next count notes (or less) left out of the listing, and
+    returns their records.
+    """
+    records = unlisted["records"]
+    if unlisted["heap"]:
+        with phase("sort"):
+            return [heappop(records)[1:] for i in xrange(min(count, len(records)))]
+    taken = records[:count]
+    del records[:count]
+    return taken
+
+@command
+def load_more(): # {{{1
+    """ Adds the next g:pad#max_listed notes left out of the listing to the
+    __pad__ buffer.
+    """
+    global cached_source, cached_filenames
+    if unlisted["records"] == []:
+        print "vim-pad: all the notes are listed"
+        return
+    with operation("more"):
+        finish_render()
+        lines = shown_lines()
+        if lines is None:
+            return
+        records = take_unlisted(unlisted["limit"])
+        new_lines = format_lines(records, metadata_store(),
+                                 pending_render["snippets"])
+        text = render_lines(new_lines)
+        with phase("write"):
+            was_modifiable = vim.current.buffer.options['modifiable']
+            vim.current.buffer.options['modifiable'] = True
+            vim.current.buffer.append(text)
+            vim.current.buffer.options['modifiable'] = was_modifiable
+        lines.extend(new_lines)
+        metadata_store().save()
+        # the cached listing shares the notes we took
+        cached_source = cached_filenames = None
+    echo_unlisted()
+
+def echo_unlisted(): # {{{1
+    """ Tells how many notes were left out of the listing, if any.
+    """
+    if unlisted["records"] != []:
+        print "vim-pad: %d more notes (<S-m> lists them)" % len(unlisted["records"])
+
+def write_list(lines): # {{{1
+    """ Replaces the contents of the __pad__ buffer with lines, a list of
+    ListLines.
+    """
+    text = render_lines(lines)
+    with phase("write"):
+        if vim.eval('&modifiable') != '1':
+            vim.current.buffer.options['modifiable'] = True
+        del vim.current.buffer[:] # clear the buffer
+        vim.current.buffer.append(text)
+        vim.command("normal! dd")
+    shown["buffer"], shown["lines"] = vim.current.buffer.number, lines
+
+def sort_list(key): # {{{1
+    """ Reorders the notes in the __pad__ buffer.
+
+    key: one of SORT_KEYS.
+
+    The notes are sorted from the ListLines of the listing, or by the note
+    database with the "sqlite" backend, so nothing is read from disk.
+    """
+    with operation("sort", key):
+        # we need the whole list in the buffer
+        finish_render()
+        lines = shown_lines()
+        if lines is None:
+            # we don't know what the buffer shows, so we start from its text
+            records = stat_records(line.split(" @")[0] for line in vim.current.buffer
+                                   if line != "")
+            lines = format_lines(records, metadata_store())
+        database = note_database() if get_config()["search_backend"] == "sqlite" else None
+        with phase("sort"):
+            if database is not None:
+                position = dict((path, i) for i, path in
+                                enumerate(database.order([line.path for line in lines], key)))
+                lines = sorted(lines, key=lambda line: position[line.path])
+            else:
+                lines = sorted(lines, key=SORT_KEYS[key])
+        write_list(lines)
+
+def update_list(moved): # {{{1
+    """ Updates the __pad__ buffer after notes in it were moved or deleted,
+    without listing the notes again.
+
+    moved: a dict mapping the paths of the notes to their new paths, or to
+    None for the ones that were deleted.
+
+    The lines of the notes that are gone (deleted, or archived when the list
+    doesn't show the archive) are removed, the ones of moved notes show
+    their new folder, and the buffer is written once. The index entries
+    follow the notes, so they aren't read again.
+
+    Returns False if the buffer isn't a list we know, so the caller should
+    list the notes again.
+    """
+    global cached_source
+    with operation("update", str(len(moved))):
+        finish_render()
+        lines = shown_lines()
+        if lines is None:
+            return False
+        index = metadata_store()
+        text = vim.current.buffer[:]
+        new_lines = []
+        new_text = []
+        for line, line_text in zip(lines, text):
+            if line.path in moved:
+                new_path = moved[line.path]
+                if new_path is None:
+                    index.forget(index.key(line.path))
+                    continue
+                entry = index.rename(line.path, new_path) or line.entry
+                if not is_listed(get_save_dir(), new_path, shown["archive"]):
+                    continue  # archived, and the list doesn't show the archive
+                line = line._replace(path=new_path, entry=entry)
+                line_text = render_lines([line])[0]
+            new_lines.append(line)
+            new_text.append(line_text)
+        index.save()
+        # the listings we keep are out of date
+        reset_query_cache()
+        cached_source = None
+        cancel_async_search()
+
+        if new_lines == []:
+            vim.command("bw")
+            print "vim-pad: no pads"
+            return True
+        row = min(vim.current.window.cursor[0], len(new_lines))
+        with phase("write"):
+            was_modifiable = vim.current.buffer.options['modifiable']
+            vim.current.buffer.options['modifiable'] = True
+            vim.current.buffer[:] = new_text
+            vim.current.buffer.options['modifiable'] = was_modifiable
+        shown["lines"] = new_lines
+        vim.current.window.cursor = (row, 0)
+    return True
+
+def shown_lines(): # {{{1
+    """ Returns the ListLines for the lines of the current buffer, or None if
+    it isn't a list of notes we wrote.
+    """
+    lines = shown["lines"]
+    if shown["buffer"] != vim.current.buffer.number or len(lines) != len(vim.current.buffer):
+        return None
+    return lines
+
+def selected_line(): # {{{1
+    """ Returns the ListLine under the cursor, or None if unknown.
+    """
+    lines = shown_lines()
+    if lines is None or lines == []:
+        return None
+    return lines[vim.current.window.cursor[0] - 1]
+
+def selected_info(): # {{{1
+    """ Returns the title, human date and id of the selected note, for
+    pad#GetPadTitle and friends. Empty if unknown.
+    """
+    line = selected_line()
+    if line is None:
+        return {}
+    return {"title": "[EMPTY]" if line.entry.isEmpty else line.entry.summary,
+            "date": mtime_timestamp(line.mtime),
+            "id": line.path}
+
+@command
+def render_more(render_id, limit=None): # {{{1
+    """ Adds the next chunk of notes of the last listing to the __pad__ buffer.
+
+    render_id: the listing the call was scheduled for. Calls for older
+    listings do nothing.
+
+    limit: how many notes to add. Defaults to g:pad#render_chunk_size.
+    If there are notes left afterwards, another call is scheduled.
+    """
+    if render_id != pending_render["id"]:
+        return
+    with operation("render"):
+        buf = get_list_buffer()
+        if buf is None:
+            cancel_render()
+            return
+        if limit is None:
+            limit = get_config().number("render_chunk_size")
+        chunk = pending_render["files"][:limit]
+        pending_render["files"] = pending_render["files"][limit:]
+        index = metadata_store()
+        lines = format_lines(chunk, index, pending_render["snippets"])
+        pending_render["lines"].extend(lines)
+
+        if lines != []:
+            text = render_lines(lines)
+            with phase("write"):
+                was_modifiable = buf.options['modifiable']
+                buf.options['modifiable'] = True
+                buf.append(text)
+                buf.options['modifiable'] = was_modifiable
+
+        if pending_render["files"] != []:
+            vim.command("call timer_start(0, function('pad#RenderMore', [" +
+                        str(render_id) + "]))")
+        else:
+            finish_render()
+
+def finish_render(): # {{{1
+    """ Adds all the notes left from the last listing to the __pad__ buffer.
+    """
+    global cached_filenames, cached_timestamps, cached_data, cached_source, \
+            cached_unlisted, cached_store
+
+    if pending_render["files"] != []:
+        render_more(pending_render["id"], len(pending_render["files"]))
+        return
+    metadata_store().save()
+    if pending_render["cache"] is not None:
+        cached_source, cached_filenames, cached_timestamps, cached_unlisted, \
+                cached_store = pending_render["cache"]
+        cached_data = pending_render["lines"]
+    pending_render["cache"] = None
+
+def cancel_render(): # {{{1
+    """ Stops adding notes from the last listing to the __pad__ buffer.
+    """
+    pending_render["id"] += 1
+    pending_render["files"] = []
+    pending_render["cache"] = None
+
+@command
 def display(query, archive): # {{{1
     """ Shows a list of notes.
 
@@ -265,26 +939,203 @@ def display(query, archive): # {{{1
         vim.command('let tmp = confirm("IMPORTANT:\n'\
                 'Please set g:pad#dir to a valid path in your vimrc.", "OK", 1, "Error")')
         return
-    pad_files = get_filelist(query, archive)
-    if len(pad_files) > 0:
-        if vim.eval("bufexists('__pad__')") == "1":
-            vim.command("bw __pad__")
-        if vim.eval('g:pad#position["list"]') == "right":
-            vim.command("silent! rightbelow " + str(vim.eval('g:pad#window_width')) + "vnew __pad__")
+    with operation("ls", query):
+        cancel_async_search()
+        tag_query = TAG_QUERY_RE.match(query) is not None
+        ranked = query != "" and not tag_query and get_config().flag("search_ranked")
+        use_async = query != "" and not tag_query and not ranked and can_search_async()
+        snippets = None
+        if use_async:
+            pad_files = []
+        elif query == "":
+            pad_files = get_filerecords(archive)
+        elif tag_query:
+            pad_files = get_tagged_records(query, archive)
+        elif ranked:
+            pad_files, snippets = ranked_search(query, archive)
         else:
-            vim.command("silent! botright " + str(vim.eval("g:pad#window_height")) + "new __pad__")
-        fill_list(pad_files, query != "")
-        if query != "":
-            vim.command("let b:pad_query = '" + query + "'")
-        vim.command("set filetype=pad")
-        vim.command("setlocal nomodifiable")
-        vim.command("setlocal statusline=%#PreCondit#\ vim-pad%=%#Comment#" + \
-                    "%#Special#q%#Comment#:close\ %#Special#dd%#Comment#:delete\ " + \
-                    "%#Special#[-+]a%#Comment#:[un]archive\ %#Special#[-+]f%#Comment#:move\ [from\|to]\ " + \
-                    "%#Special#<s-f>%#Comment#:search\ %#Special#<s-s>%#Comment#:sort\ ")
+            pad_files = get_filelist(query, archive)
+        if use_async or len(pad_files) > 0:
+            if vim.eval("bufexists('__pad__')") == "1":
+                vim.command("bw __pad__")
+            if query == "":
+                # forget the notes that are gone since the last full listing
+                metadata_store().prune([pad for pad, st in pad_files], archive)
+            if get_config()["position"]["list"] == "right":
+                vim.command("silent! rightbelow " + get_config()["window_width"] + "vnew __pad__")
+            else:
+                vim.command("silent! botright " + get_config()["window_height"] + "new __pad__")
+            shown["archive"] = archive
+            if use_async:
+                start_async_search(query, archive, close_if_empty=True)
+            else:
+                fill_list(pad_files, query != "", snippets=snippets)
+            if query != "":
+                vim.command("let b:pad_query = '" + query + "'")
+            vim.command("set filetype=pad")
+            vim.command("setlocal nomodifiable")
+            vim.command("setlocal statusline=%#PreCondit#\ vim-pad%=%#Comment#" + \
+                        "%#Special#q%#Comment#:close\ %#Special#dd%#Comment#:delete\ " + \
+                        "%#Special#[-+]a%#Comment#:[un]archive\ %#Special#[-+]f%#Comment#:move\ [from\|to]\ " + \
+                        "%#Special#<s-f>%#Comment#:search\ %#Special#<s-s>%#Comment#:sort\ " + \
+                        ("%#Special#<s-m>%#Comment#:more\ " if get_config().number("max_listed") > 0 else ""))
+            echo_unlisted()
+        else:
+            print "vim-pad: no pads"
+
+def can_search_async(): # {{{1
+    """ Tells whether searches should run as background jobs.
+    """
+    config = get_config()
+    return config.flag("async_search") \
+            and config["search_backend"] not in ("internal", "worker", "sqlite") \
+            and config.has_jobs
+
+def get_list_buffer(): # {{{1
+    """ Returns the __pad__ buffer, or None if it is not loaded.
+    """
+    for buf in vim.buffers:
+        if buf.name and buf.name.endswith("__pad__"):
+            return buf
+    return None
+
+def start_async_search(query, archive=None, close_if_empty=False): # {{{1
+    """ Starts a search job for query, cancelling the previous one.
+
+    The __pad__ buffer is cleared, and the matching notes are added to it as
+    the job reports them (see on_async_output and on_async_exit).
+
+    close_if_empty: whether to close the list if nothing matches.
+    """
+    cancel_async_search()
+    cancel_render()
+    async_search["files"] = []
+    async_search["seen"] = set()
+    async_search["running"] = True
+    async_search["close_if_empty"] = close_if_empty
+    command = search_command(search_roots(), archive, query)
+
+    buf = get_list_buffer()
+    if buf is not None:
+        buf.options['modifiable'] = True
+        del buf[:]
+        buf.options['modifiable'] = False
+        shown["buffer"], shown["lines"] = buf.number, []
+    # matches by file and folder name don't need the job
+    on_async_output(async_search["id"], listdir_names(query, archive))
+    vim.command("call pad#StartSearchJob([" +
+                ", ".join("'" + arg.replace("'", "''") + "'" for arg in command) +
+                "], " + str(async_search["id"]) + ")")
+
+def cancel_async_search(): # {{{1
+    """ Stops the running search job, if any, and ignores its pending output.
+    """
+    async_search["id"] += 1
+    if async_search["running"]:
+        async_search["running"] = False
+        vim.command("call pad#StopSearchJob()")
+
+def wait_async_search(): # {{{1
+    """ Blocks until the running search job, if any, finishes.
+    """
+    if async_search["running"]:
+        vim.command("call pad#WaitSearchJob()")
+
+@command
+def on_async_output(search_id, paths): # {{{1
+    """ Adds the notes found by a search job to the __pad__ buffer.
+
+    Output from jobs other than the last one started is ignored.
+    """
+    if search_id != async_search["id"]:
+        return
+    buf = get_list_buffer()
+    index = metadata_store()
+    records = stat_records(p for p in paths if p != "" and p not in async_search["seen"])
+    for path, st in records:
+        async_search["seen"].add(path)
+        async_search["files"].append((path, st))
+    lines = format_lines(records, index)
+    if buf is None or lines == []:
+        return
+    buf.options['modifiable'] = True
+    if len(buf) == 1 and buf[0] == "":
+        buf[:] = render_lines(lines)
     else:
-        print "vim-pad: no pads"
+        buf.append(render_lines(lines))
+    if shown["buffer"] == buf.number:
+        shown["lines"].extend(lines)
+    buf.options['modifiable'] = False
+    vim.command("redraw")
 
+@command
+def on_async_exit(search_id): # {{{1
+    """ Called when a search job finishes. Sorts the results by date.
+    """
+    if search_id != async_search["id"]:
+        return
+    async_search["running"] = False
+    metadata_store().save()
+    buf = get_list_buffer()
+    if buf is None:
+        return
+    if async_search["files"] == []:
+        if async_search["close_if_empty"]:
+            vim.command("bw " + str(buf.number))
+            print "vim-pad: no pads"
+        return
+    if vim.current.buffer.number == buf.number:
+        vim.command("setlocal modifiable")
+        fill_list(async_search["files"], True)
+        vim.command("setlocal nomodifiable")
+    vim.command("redraw")
+
+@command
+def show_cache_stats(): # {{{1
+    """ Prints the size of the notes index (or database) and how often it was
+    up to date, and the size of the search worker.
+    """
+    index_stats = metadata_store().stats()
+    lookups = index_stats["hits"] + index_stats["misses"]
+    limit = " (max %d)" % index_stats["max_entries"] if index_stats["max_entries"] > 0 else ""
+    print "vim-pad: %d notes indexed%s, %dKB of text, %d folders, %d tags; " \
+          "%d lookups, %.1f%% hits, %d evicted" % (
+            index_stats["entries"], limit, index_stats["text_bytes"] / 1024,
+            index_stats["folders"], index_stats["tags"], lookups,
+            100.0 * index_stats["hits"] / lookups if lookups else 0,
+            index_stats["evictions"])
+    if "file_bytes" in index_stats:
+        print "vim-pad: note database: %s, %dKB" % (metadata_store().path,
+                                                     index_stats["file_bytes"] / 1024)
+    if get_config()["search_backend"] == "worker":
+        from vim_pad.search_worker import WorkerError
+        try:
+            worker = search_worker().stats()
+        except WorkerError:
+            worker = None
+        if worker is None:
+            print "vim-pad: search worker not running"
+        else:
+            print "vim-pad: search worker: %d notes in memory, %.1fMB, %d requests, " \
+                  "started %d times" % (worker["notes"], worker["rss"],
+                                        worker["requests"], search_worker().starts)
+
+@command
+def show_stats(): # {{{1
+    """ Prints the timings of the last operations (see vim_pad.stats).
+    """
+    operations = history()
+    if operations == []:
+        if get_config().flag("stats"):
+            print "vim-pad: no operations recorded yet"
+        else:
+            print "vim-pad: set g:pad#stats to 1 to record timings"
+        return
+    print "vim-pad: last %d operations, in ms" % len(operations)
+    for op in operations:
+        print "  " + op.format()
+
+@command
 def search_pads(): # {{{1
     """ Aks for a query and lists the matching notes.
     """
@@ -296,18 +1147,101 @@ def search_pads(): # {{{1
     display(query, "")
     vim.command("redraw!")
 
+class QueryReader(object): # {{{1
+    """ Reads the query typed in the incremental searches.
+
+    read() returns once the typing pauses for g:pad#search_debounce ms, so
+    keys typed while a search ran are taken together, and only the latest
+    query is searched for. A search that takes longer than
+    g:pad#search_time_budget ms is interrupted if more keys were typed.
+    """
+
+    def __init__(self):
+        config = get_config()
+        self.debounce = config.number("search_debounce") / 1000.0
+        self.budget = config.number("search_time_budget") / 1000.0
+        self.deadline = None
+        self.query = ""
+        self.last_char = ""
+
+    def apply(self, raw_char):
+        """ Adds a key to the query. Returns it if it ends the search.
+        """
+        if raw_char in ("13", "27"):
+            return raw_char
+        try:   # if we can convert to an int, we have a regular key
+            int(raw_char)   # we bring up an error on nr2char
+            self.last_char = vim.eval("nr2char(" + raw_char + ")")
+            self.query = self.query + self.last_char
+        except:  # if we don't, we have some special key
+            keycode = unicode(raw_char, errors="ignore")
+            if keycode == "kb":  # backspace
+                self.query = self.query[:-len(self.last_char)]
+        return None
+
+    def read(self):
+        """ Waits for a key, takes the ones typed after it until the typing
+        pauses, and returns Enter ("13") or Esc ("27") if they end the
+        search, or None.
+        """
+        key = self.apply(vim.eval("getchar()"))
+        deadline = time.time() + self.debounce
+        while key is None:
+            raw_char = vim.eval("getchar(0)")
+            if raw_char != "0":
+                key = self.apply(raw_char)
+                deadline = time.time() + self.debounce
+            elif time.time() >= deadline:
+                break
+            else:
+                time.sleep(0.01)
+        self.deadline = time.time() + self.budget
+        return key
+
+    def interrupted(self):
+        """ Tells whether the search for the query should stop: it is over
+        the time budget, and keys were typed after it.
+        """
+        return self.budget > 0 and time.time() > self.deadline and self.typeahead()
+
+    def typeahead(self):
+        """ Tells whether keys were typed that weren't read yet.
+        """
+        return vim.eval("getchar(1)") != "0"
+
+@command
 def global_incremental_search(should_open=True):  # {{{1
     """ Provides incremental search in normal mode without opening the list.
     """
-    query = ""
+    reader = QueryReader()
+    searched_query = ""
     should_create_on_enter = False
+    info = ""
+    reset_query_cache()
 
     vim.command("echohl None")
     vim.command('echo ">> "')
     while True:
-        raw_char = vim.eval("getchar()")
-        if raw_char in ("13", "27"):
-            if raw_char == "13":
+        key = reader.read()
+        query = reader.query
+        if query != searched_query:
+            with operation("search", query):
+                # after Enter or Esc, we need the results whatever they cost
+                interrupted = reader.interrupted if key is None else None
+                pad_files = incremental_filelist(query, interrupted=interrupted)
+            if pad_files is None:
+                continue  # the query was typed past while we searched
+            searched_query = query
+            if pad_files != []:
+                info = ""
+                vim.command("echohl None")
+                should_create_on_enter = False
+            else:  # we will create a new pad
+                info = "[NEW] "
+                vim.command("echohl WarningMsg")
+                should_create_on_enter = True
+        if key is not None:
+            if key == "13":
                 if should_create_on_enter:
                     if should_open == True:
                         open_pad(first_line=query)
@@ -319,24 +1253,6 @@ def global_incremental_search(should_open=True):  # {{{1
                     display(query, True)
             vim.command("redraw!")
             break
-        else:
-            try:   # if we can convert to an int, we have a regular key
-                int(raw_char)   # we bring up an error on nr2char
-                last_char = vim.eval("nr2char(" + raw_char + ")")
-                query = query + last_char
-            except:  # if we don't, we have some special key
-                keycode = unicode(raw_char, errors="ignore")
-                if keycode == "kb":  # backspace
-                    query = query[:-len(last_char)]
-        pad_files = get_filelist(query)
-        if pad_files != []:
-            info = ""
-            vim.command("echohl None")
-            should_create_on_enter = False
-        else:  # we will create a new pad
-            info = "[NEW] "
-            vim.command("echohl WarningMsg")
-            should_create_on_enter = True
         vim.command("redraw")
         vim.command('echo ">> ' + info + query + '"')
 
@@ -0,0 +1,277 @@
+# coding=utf-8
+""" Persistent index of the data shown in the notes list.
+
+The index is a hidden file inside g:pad#dir. Entries are keyed by the note
+path relative to the save dir and store its (mtime, size, inode) signature
+next to the data PadInfo extracted, so notes are only read when they change.
+The index also maps each tag to the notes that have it, so notes can be
+filtered and sorted by tags without reading them. Unlike the summary, tags
+are looked for in the whole note.
+
+The file also records the settings the notes were parsed with
+(g:pad#read_nchars_from_files and g:pad#title_first_line); if they changed, it
+is ignored. It is written with marshal, which is much faster to load than
+json or pickle, but is not safe against malformed or malicious data, so the
+save dir must only be writable by its owner. Since marshal's format depends on
+the python version, the file starts with a line naming the version that wrote
+it, and other versions (like another vim build using a synced save dir) ignore
+it without parsing it.
+
+If g:pad#cache_max_entries is set, only that many entries are kept (in memory
+and in the file), dropping the least recently used ones. The tags of every
+note are kept regardless, so tag queries and tag sorts still see all the notes.
+"""
+import os
+import heapq
+import marshal
+import sys
+from collections import namedtuple
+from os.path import join, relpath, abspath, sep
+from vim_pad.walk import signature
+from vim_pad.pad import PadInfo, read_notes, note_tags, parse_options, note_folder
+from vim_pad.config import get_config
+from vim_pad.stats import phase, add_count
+
+INDEX_FILENAME = ".vim-pad-index"
+INDEX_VERSION = 6
+INDEX_HEADER = "vim-pad index %d, python %d.%d\n" % ((INDEX_VERSION,) + sys.version_info[:2])
+
+NoteEntry = namedtuple("NoteEntry", "signature summary body folder tags isEmpty")
+
+
+def make_entry(st, info, text):
+    """ Returns the NoteEntry for a note with stat st and contents text,
+    parsed into info.
+
+    Folders and tags are interned, since many notes share them.
+    """
+    return NoteEntry(signature(st), info.summary, info.body, intern(info.folder),
+                     tuple(intern(tag) for tag in note_tags(info, text)), info.isEmpty)
+
+
+class MetadataIndex(object):
+
+    def __init__(self, save_dir, max_entries=0, parsed_with=None):
+        self.save_dir = abspath(save_dir)
+        # the (nchars, title_first_line) settings the entries were parsed with
+        self.parsed_with = parsed_with
+        self.path = join(self.save_dir, INDEX_FILENAME)
+        self.entries = {}
+        self.note_tags = {}  # key -> tags, for every note, even evicted ones
+        self.tags = {}  # tag -> set of keys
+        self.dirty = False
+        self.max_entries = max_entries  # 0 for no limit
+        self.used = {}  # key -> clock when it was last used, if limited
+        self.clock = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load()
+
+    def load(self):
+        """ Reads the index file, if there is a valid one.
+        """
+        try:
+            with open(self.path, "rb") as index_file:
+                if index_file.readline() != INDEX_HEADER:
+                    return
+                parsed_with, entries, note_tags = marshal.load(index_file)
+            if parsed_with != self.parsed_with:
+                return
+            self.entries = dict((key, NoteEntry(tuple(sig), summary, body, intern(folder),
+                                                tuple(intern(tag) for tag in note_tags),
+                                                is_empty))
+                                for key, (sig, summary, body, folder, note_tags, is_empty)
+                                in entries.iteritems())
+            for key, tags in note_tags.iteritems():
+                self.add_tags(key, tuple(intern(tag) for tag in tags))
+        except Exception:  # missing, unreadable or corrupt index
+            self.entries, self.note_tags, self.tags = {}, {}, {}
+
+    def save(self):
+        """ Writes the index to disk, if it changed since it was loaded.
+        """
+        if not self.dirty:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as index_file:
+                index_file.write(INDEX_HEADER)
+                # marshal only takes plain tuples
+                marshal.dump((self.parsed_with,
+                              dict((key, tuple(entry)) for key, entry in self.entries.iteritems()),
+                              self.note_tags), index_file)
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError):
+            return
+        self.dirty = False
+
+    def key(self, path):
+        prefix = self.save_dir + sep
+        if path.startswith(prefix):
+            rest = path[len(prefix):]
+            if sep + sep not in rest and sep + "." not in sep + rest:
+                return rest  # already normalized
+        path = abspath(path)
+        if path.startswith(self.save_dir + sep):
+            return relpath(path, self.save_dir)
+        return path
+
+    def store(self, key, entry):
+        """ Sets the entry for key, updating the tags of the note.
+        """
+        self.remove_tags(key)
+        self.entries[key] = entry
+        self.touch(key)
+        self.add_tags(key, entry.tags)
+        self.dirty = True
+
+    def add_tags(self, key, tags):
+        self.note_tags[key] = tags
+        for tag in tags:
+            self.tags.setdefault(tag, set()).add(key)
+
+    def remove_tags(self, key):
+        for tag in self.note_tags.pop(key, ()):
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+    def rename(self, old_path, new_path):
+        """ Moves the entry of a note to its new path, so a moved note isn't
+        read again. Returns the new entry, or None if the note wasn't indexed.
+        """
+        entry = self.entries.get(self.key(old_path))
+        if entry is None:
+            self.forget(self.key(old_path))
+            return None
+        self.forget(self.key(old_path))
+        entry = entry._replace(folder=intern(note_folder(new_path)))
+        self.store(self.key(new_path), entry)
+        return entry
+
+    def forget(self, key):
+        """ Removes the entry and the tags for key, if there are any.
+        """
+        self.used.pop(key, None)
+        if self.entries.pop(key, None) is None and key not in self.note_tags:
+            return
+        self.remove_tags(key)
+        self.dirty = True
+
+    def touch(self, key):
+        """ Marks key as used, for the least recently used ones to be the
+        first to go.
+        """
+        if self.max_entries > 0:
+            self.used[key] = self.clock
+            self.clock += 1
+
+    def evict(self):
+        """ Drops the least recently used entries, if there are more than
+        max_entries. Their tags are kept.
+        """
+        if self.max_entries <= 0 or len(self.entries) <= self.max_entries:
+            return
+        # we go a tenth below the limit, so we don't do this on every call
+        count = len(self.entries) - self.max_entries + self.max_entries / 10
+        for key in heapq.nsmallest(count, self.entries, key=lambda k: self.used.get(k, -1)):
+            del self.entries[key]
+            self.used.pop(key, None)
+        self.evictions += count
+        self.dirty = True
+
+    def stats(self):
+        """ Returns a dict with the number of entries, the size of the text
+        they hold, and how often lookups found them up to date.
+        """
+        text = sum(len(e.summary) + len(e.body) for e in self.entries.itervalues())
+        folders = set(e.folder for e in self.entries.itervalues())
+        return {"entries": len(self.entries), "max_entries": self.max_entries,
+                "text_bytes": text, "folders": len(folders), "tags": len(self.tags),
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def tagged(self, tags):
+        """ Returns the keys of the notes that have all of tags.
+        """
+        keys = None
+        for tag in tags:
+            found = self.tags.get(tag.lower(), set())
+            keys = found.copy() if keys is None else keys & found
+        return keys or set()
+
+    def lookup_many(self, records, options=None, workers=0):
+        """ Returns the NoteEntry for each (path, stat) record, in order.
+
+        options: the result of pad.parse_options(), if already known.
+
+        The notes that changed are read whole, for their tags, by a pool of
+        worker threads if workers > 1 (see pad.read_notes), and parsed
+        afterwards in the calling thread.
+        """
+        if options is None:
+            options = parse_options()
+        stale = []
+        for path, st in records:
+            key = self.key(path)
+            entry = self.entries.get(key)
+            if entry is None or entry.signature != signature(st):
+                stale.append((path, st))
+            else:
+                self.touch(key)
+        self.hits += len(records) - len(stale)
+        self.misses += len(stale)
+        add_count("index hits", len(records) - len(stale))
+        add_count("index misses", len(stale))
+
+        notes = read_notes(stale, options, workers)
+
+        unreadable = {}
+        with phase("parse"):
+            for (path, st), note in zip(stale, notes):
+                head, text = note if note is not None else ([], "")
+                entry = make_entry(st, PadInfo(head, path, options), text)
+                if note is None:  # we will try again next time
+                    unreadable[path] = entry
+                else:
+                    self.store(self.key(path), entry)
+        entries = [unreadable.get(path) or self.entries[self.key(path)]
+                   for path, st in records]
+        self.evict()
+        return entries
+
+    def prune(self, paths, archive=None):
+        """ Removes the entries for notes under the save dir that are not in
+        paths.
+
+        paths: the result of a full listing of the save dir.
+
+        archive: if it is not "!", the listing skipped archived notes, so
+        we keep their entries.
+        """
+        listed = set(self.key(path) for path in paths)
+        for key in list(self.note_tags):
+            if key in listed or key.startswith(sep):
+                continue
+            if archive != "!" and "archive" in key.split(sep)[:-1]:
+                continue
+            self.forget(key)
+
+
+_indexes = {}
+
+
+def get_index(save_dir):
+    """ Returns the MetadataIndex for save_dir, loading it on first use, or
+    when the settings that change how notes are parsed changed.
+    """
+    max_entries = get_config().number("cache_max_entries")
+    options = parse_options()
+    parsed_with = (options.nchars, options.title_first_line)
+    if save_dir not in _indexes or _indexes[save_dir].parsed_with != parsed_with:
+        _indexes[save_dir] = MetadataIndex(save_dir, max_entries, parsed_with)
+    index = _indexes[save_dir]
+    index.max_entries = max_entries
+    return index
@@ -3,18 +3,27 @@
 
 # imports {{{1
 import vim
-import re
 from os import remove, mkdir
 from os.path import join, basename, exists
 from shutil import move
-from vim_pad.handler import open_pad, get_filelist, fill_list
-from vim_pad.utils import get_save_dir, make_sure_dir_is_empty
+from vim_pad.handler import open_pad, fill_list, incremental_filelist, \
+        reset_query_cache, can_search_async, start_async_search, \
+        wait_async_search, async_search, sort_list, selected_line, shown_lines, \
+        display, QueryReader
+from vim_pad.handler import update_list as handler_update_list
+from vim_pad.utils import get_save_dir, make_sure_dir_is_empty, touch
+from vim_pad.config import command
+from vim_pad.stats import operation
 
 
 def get_selected_path():  # {{{1
+    line = selected_line()
+    if line is not None:
+        return line.path
     return join(get_save_dir(), vim.current.line.split(" @")[0])
 
 
+@command
 def edit_pad():  # {{{1
     """ Opens the currently selected note in the __pad__ buffer.
     """
@@ -24,91 +33,148 @@ def edit_pad():  # {{{1
     open_pad(path=path, query=query)
 
 
-def delete_pad():  # {{{1
-    """ Deletes the currently selected note in the __pad__ buffer.
+def get_selected_paths(first=None, last=None):  # {{{1
+    """ Returns the paths of the notes in lines first to last of the __pad__
+    buffer, or of the note under the cursor.
     """
-    confirm = vim.eval('input("really delete? (y/n): ")')
+    if first is None:
+        first = last = vim.current.window.cursor[0]
+    lines = shown_lines()
+    if lines is not None:
+        return [line.path for line in lines[first - 1:last]]
+    return [join(get_save_dir(), line.split(" @")[0])
+            for line in vim.current.buffer[first - 1:last] if line != ""]
+
+
+def update_list(moved):  # {{{1
+    """ Shows the changes in moved (see handler.update_list) in the __pad__
+    buffer, listing the notes again if it can't be updated in place.
+    """
+    if not handler_update_list(moved):
+        display(vim.eval('b:pad_query'), "")
+
+
+@command
+def delete_pad(first=None, last=None):  # {{{1
+    """ Deletes the selected notes in the __pad__ buffer.
+
+    first, last: the lines of the notes, for visual selections. Defaults to
+    the line under the cursor.
+    """
+    paths = get_selected_paths(first, last)
+    if len(paths) > 1:
+        confirm = vim.eval('input("really delete %d notes? (y/n): ")' % len(paths))
+    else:
+        confirm = vim.eval('input("really delete? (y/n): ")')
     if confirm in ("y", "Y"):
-        path = get_selected_path()
-        remove(path)
-        make_sure_dir_is_empty(path)
-        vim.command("ListPads")
+        for path in paths:
+            remove(path)
+            touch(path)
+            make_sure_dir_is_empty(path)
+        update_list(dict.fromkeys(paths))
         vim.command("redraw!")
 
 
-def move_to_folder(path=None):  # {{{1
-    """ Moves the selected pad to a subfolder of g:pad#dir
+@command
+def move_to_folder(path=None, first=None, last=None):  # {{{1
+    """ Moves the selected notes to a subfolder of g:pad#dir
     """
-    selected_path = get_selected_path()
-    if path is None:
+    selected_paths = get_selected_paths(first, last)
+    asked = path is None
+    if asked:
         path = vim.eval('input("move to: ")')
     if not exists(join(get_save_dir(), path)):
         mkdir(join(get_save_dir(), path))
-    move(selected_path, join(get_save_dir(), path, basename(selected_path)))
-    make_sure_dir_is_empty(path)
-    vim.command("ListPads")
-    if path is None:
+    moved = {}
+    for selected_path in selected_paths:
+        new_path = join(get_save_dir(), path, basename(selected_path))
+        if new_path == selected_path:
+            continue
+        move(selected_path, new_path)
+        touch(selected_path)
+        touch(new_path)
+        make_sure_dir_is_empty(selected_path)
+        moved[selected_path] = new_path
+    update_list(moved)
+    if asked:
         vim.command("redraw!")
 
 
-def move_to_savedir():  # {{{1
-    """ Moves a note to g:pad#dir
+@command
+def move_to_savedir(first=None, last=None):  # {{{1
+    """ Moves the selected notes to g:pad#dir
     """
-    move_to_folder("")
+    move_to_folder("", first, last)
 
 
-def archive_pad():  # {{{1
-    """ Archives the currently selected note
+@command
+def archive_pad(first=None, last=None):  # {{{1
+    """ Archives the selected notes
     """
-    move_to_folder("archive")
+    move_to_folder("archive", first, last)
 
 
-def unarchive_pad():  # {{{1
-    """ Unarchives the currently selected note
+@command
+def unarchive_pad(first=None, last=None):  # {{{1
+    """ Unarchives the selected notes
     """
-    move_to_savedir()
+    move_to_savedir(first, last)
 
 
+@command
 def incremental_search():  # {{{1
     """ Provides incremental search within the __pad__ buffer.
     """
-    query = ""
+    reader = QueryReader()
+    shown_query = ""
     should_create_on_enter = False
+    info = ""
+    reset_query_cache()
 
     vim.command("echohl None")
     vim.command('echo ">> "')
     while True:
-        raw_char = vim.eval("getchar()")
-        if raw_char in ("13", "27"):
-            if raw_char == "13" and should_create_on_enter:
+        key = reader.read()
+        query = reader.query
+        if query != shown_query and query != "" and can_search_async():
+            vim.command("let b:pad_query = '"+query+"'")
+            start_async_search(query)
+            info = ""
+            vim.command("echohl None")
+            should_create_on_enter = None  # we know once the search is done
+            shown_query = query
+        elif query != shown_query:
+            with operation("search", query):
+                # after Enter or Esc, we need the results whatever they cost
+                interrupted = reader.interrupted if key is None else None
+                pad_files = incremental_filelist(query, interrupted=interrupted)
+                if pad_files is None or (key is None and reader.typeahead()):
+                    continue  # the query was typed past while we searched
+                vim.command("setlocal modifiable")
+                if pad_files != []:
+                    vim.command("let b:pad_query = '"+query+"'")
+                    fill_list(pad_files, query != "")
+                    vim.command("setlocal nomodifiable")
+                    info = ""
+                    vim.command("echohl None")
+                    should_create_on_enter = False
+                else:  # we will create a new pad
+                    del vim.current.buffer[:]
+                    info = "[NEW] "
+                    vim.command("echohl WarningMsg")
+                    should_create_on_enter = True
+            shown_query = query
+        if key is not None:
+            if key == "13" and should_create_on_enter is None:
+                # the search is running in the background
+                wait_async_search()
+                should_create_on_enter = async_search["files"] == []
+            if key == "13" and should_create_on_enter:
                 vim.command("bw")
                 open_pad(first_line=query)
                 vim.command("echohl None")
             vim.command("redraw!")
             break
-        else:
-            try:   # if we can convert to an int, we have a regular key
-                int(raw_char)   # we bring up an error on nr2char
-                last_char = vim.eval("nr2char(" + raw_char + ")")
-                query = query + last_char
-            except:  # if we don't, we have some special key
-                keycode = unicode(raw_char, errors="ignore")
-                if keycode == "kb":  # backspace
-                    query = query[:-len(last_char)]
-        vim.command("setlocal modifiable")
-        pad_files = get_filelist(query)
-        if pad_files != []:
-            vim.command("let b:pad_query = '"+query+"'")
-            fill_list(pad_files, query != "")
-            vim.command("setlocal nomodifiable")
-            info = ""
-            vim.command("echohl None")
-            should_create_on_enter = False
-        else:  # we will create a new pad
-            del vim.current.buffer[:]
-            info = "[NEW] "
-            vim.command("echohl WarningMsg")
-            should_create_on_enter = True
         vim.command("redraw")
         vim.command('echo ">> ' + info + query + '"')
 # }}}1
@@ -116,40 +182,18 @@ def incremental_search():  # {{{1
 SORT_TYPES = {
         "1": "title",
         "2": "tags",
-        "3": "date"
+        "3": "date",
+        "4": "folder",
+        "5": "size"
         }
 
 
+@command
 def sort(key="1"):  # {{{1
 
     if key not in SORT_TYPES:
         return
 
-    key = SORT_TYPES[key]
-    if key == "date":
-        vim.command("ListPads")
-        return
-
-    tuples = []
-    if key == "tags":
-        view_files = [line.split()[0] for line in vim.current.buffer]
-        for pad_id in view_files:
-            with open(pad_id) as fi:
-                tags = sorted([tag.lower().replace("@", "")
-                                for tag in re.findall("@\w*", fi.read(200))])
-            tuples.append((pad_id, tags))
-        tuples = sorted(tuples, key=lambda f: f[1])
-        tuples = filter(lambda i: i[1] != [], tuples) + \
-                 filter(lambda i: i[1] == [], tuples)
-    elif key == "title":
-        l = 1
-        for line in vim.current.buffer:
-            pad_id = line.split()[0]
-            title = vim.eval('''split(split(substitute(getline(''' + str(l) + '''), '↲','\n', "g"), '\n')[0], ' │ ')[1]''')
-            tuples.append((pad_id, title))
-            l += 1
-        tuples = sorted(tuples, key=lambda f: f[1])
-
     vim.command("setlocal modifiable")
-    fill_list([f[0] for f in tuples], custom_order=True)
+    sort_list(SORT_TYPES[key])
     vim.command("setlocal nomodifiable")
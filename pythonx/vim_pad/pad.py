@@ -1,14 +1,118 @@
 import vim
 import re
+from collections import namedtuple
 from os.path import abspath, basename, dirname, relpath
 from vim_pad.timestamps import timestamp
-from vim_pad.utils import get_save_dir
+from vim_pad.config import get_config
+from vim_pad.stats import phase, add_count, recording
+
+MODELINE_RE = re.compile("^.* vim: set .*:.*$")
+ORG_TAGS_RE = re.compile("\s+(?P<tags>:.*$)")
+TAG_RE = re.compile("@(\w+)")
+SPACES_RE = re.compile("\s{2,}")
+ILLEGAL_CHARS_RE = re.compile("[*:<>/\|^]")
+NEWLINE = u'\u21b2'.encode('utf-8')
+
+ParseOptions = namedtuple("ParseOptions", "nchars title_first_line save_dir cwd")
+
+
+def parse_options():
+    """ Reads the settings PadInfo needs, so they can be shared by many calls.
+    """
+    config = get_config()
+    return ParseOptions(config.number("read_nchars_from_files"),
+                        config.flag("title_first_line"),
+                        config.save_dir,
+                        config.cwd)
+
+
+def note_folder(path, options=None):
+    """ Returns the folder of the note in path, as shown in the list.
+    """
+    if options is None:
+        options = parse_options()
+    if abspath(path).startswith(options.save_dir):
+        pos = len(options.save_dir), len(basename(path))
+        return abspath(path)[pos[0]:-pos[1]]
+    return dirname(relpath(path, options.cwd))
+
+
+def read_head(path, nchars, title_first_line=False):
+    """ Returns the lines of the start of a note, as PadInfo reads them.
+
+    Doesn't use the vim module, so it can be called from worker threads.
+    """
+    with open(path) as note:
+        if title_first_line:
+            return note.readline().split("\n")
+        return note.read(nchars).split("\n")
+
+
+def read_note(path, options):
+    """ Returns the lines of the start of the note in path, as PadInfo reads
+    them (see read_head), and its whole text.
+    """
+    with open(path) as note:
+        text = note.read()
+    if options.title_first_line:
+        return text.split("\n", 1)[:1], text
+    return text[:options.nchars].split("\n"), text
+
+
+def read_notes(records, options, workers=0):
+    """ Returns what read_note returns for each (path, stat) record, in
+    order, or None for the notes that couldn't be read.
+
+    The notes are read by a pool of worker threads, if workers > 1.
+    """
+    def read(record):
+        try:
+            return read_note(record[0], options)
+        except IOError:
+            return None
+
+    with phase("read"):
+        if workers > 1 and len(records) > 1:
+            from multiprocessing.pool import ThreadPool
+            pool = ThreadPool(min(workers, len(records)))
+            try:
+                notes = pool.map(read, records)
+            finally:
+                pool.close()
+        else:
+            notes = [read(record) for record in records]
+    if recording() and records != []:
+        add_count("read", len(records))
+        add_count("bytes read", sum(len(note[1]) for note in notes if note is not None))
+    return notes
+
+
+def note_tags(info, text):
+    """ Returns the tags PadInfo found in info, and the @tags in the rest of
+    the note, text being its whole contents.
+    """
+    tags = list(info.tags)
+    for tag in TAG_RE.findall(text):
+        tag = tag.lower()
+        if tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+def parse_many(paths, options=None):
+    """ Returns a PadInfo for each note in paths, reading the settings once.
+    """
+    if options is None:
+        options = parse_options()
+    return [PadInfo(read_head(path, options.nchars, options.title_first_line),
+                    path, options)
+            for path in paths]
 
 
 class PadInfo(object):
-    __slots__ = "id", "summary", "body", "isEmpty", "folder"
+    __slots__ = "id", "summary", "body", "isEmpty", "folder", "tags"
 
-    def __init__(self, source):
+    def __init__(self, source, path=None, options=None):
         """
 
         source can be:
@@ -16,62 +120,65 @@ class PadInfo(object):
         * a vim buffer
         * a file object
         * a list of strings, one per line
-        """
 
-        nchars = int(vim.eval("g:pad#read_nchars_from_files"))
+        path: if source is a list of lines read from a note (see read_head),
+        the path of the note.
+
+        options: the result of parse_options(), if already known.
+        """
         self.summary = ""
         self.body = ""
         self.isEmpty = True
         self.folder = ""
-        self.id = timestamp()
+        self.tags = []
 
         if source is vim.current.buffer:
             source = source[:10]
         elif source.__class__ == file:
-            save_dir = get_save_dir()
-            if abspath(source.name).startswith(save_dir):
-                pos = len(get_save_dir()), len(basename(source.name))
-                self.folder = abspath(source.name)[pos[0]:-pos[1]]
-            else:
-                self.folder = dirname(relpath(source.name, vim.eval('getcwd()')))
-            if vim.eval("g:pad#title_first_line") == '1':
+            if options is None:
+                options = parse_options()
+            self.folder = note_folder(source.name, options)
+            if options.title_first_line:
                 source = source.readline().split("\n")
             else:
-                source = source.read(nchars).split('\n')
+                source = source.read(options.nchars).split('\n')
+        elif path is not None:
+            self.folder = note_folder(path, options)
 
         data = [line.strip() for line in source if line != ""]
 
-        if data != []:
-            # we discard modelines
-            if re.match("^.* vim: set .*:.*$", data[0]):
-                data = data[1:]
+        # @tags can appear anywhere in the text we read
+        self.tags = [tag.lower() for tag in TAG_RE.findall("\n".join(data))]
+
+        # we discard modelines
+        if data != [] and MODELINE_RE.match(data[0]):
+            data = data[1:]
 
-            self.summary = data[0].strip()
+        if data != []:
+            self.summary = data[0]
             # vim-orgmode adds tags after whitespace
-            org_tags_data = re.search("\s+(?P<tags>:.*$)", self.summary)
+            org_tags_data = ORG_TAGS_RE.search(self.summary)
             if org_tags_data:
-                self.summary = re.sub("\s+:.*$", "", self.summary)
-            if self.summary[0] in ("%", "#"):  # pandoc and markdown titles
+                org_tags = [tag for tag in org_tags_data.group("tags").split(":") if tag != ""]
+                self.tags.extend([tag.lower() for tag in org_tags])
+                self.summary = self.summary[:org_tags_data.start()]
+            if self.summary[:1] in ("%", "#"):  # pandoc and markdown titles
                 self.summary = str(self.summary[1:]).strip()
 
-            self.body = u'\u21b2'.encode('utf-8').join(data[1:]).strip()
+            self.body = NEWLINE.join(data[1:]).strip()
             # if we have orgmode tag data, add it to the body
             if org_tags_data:
-                self.body = ' '.join(\
-                    [" ".join(\
-                              map(lambda a: "@" + a, \
-                                  filter(lambda a: a != "", \
-                                         org_tags_data.group("tags").split(":")))), \
-                     self.body])
+                self.body = ' '.join([" ".join(["@" + tag for tag in org_tags]), self.body])
             # remove extra spaces in bodies
-            self.body = re.sub("\s{2,}", "", self.body)
+            self.body = SPACES_RE.sub("", self.body)
 
         if self.summary != "":
             self.isEmpty = False
             self.id = self.summary.lower().replace(" ", "_")
             # remove ilegal characters from names (using rules for windows
             # systems to err on the side of precaution)
-            self.id = re.sub("[*:<>/\|^]", "", self.id)
+            self.id = ILLEGAL_CHARS_RE.sub("", self.id)
+        else:
+            self.id = timestamp()
 
-        if self.id.startswith("."):
-            self.id = re.sub("^\.*", "", self.id)
+        self.id = self.id.lstrip(".")
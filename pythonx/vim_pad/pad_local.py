@@ -3,11 +3,13 @@ from shutil import move
 from os import remove, mkdir
 from os.path import expanduser, exists, join, splitext, isfile, basename, dirname
 from vim_pad.pad import PadInfo
-from vim_pad.utils import get_save_dir
+from vim_pad.utils import get_save_dir, touch
+from vim_pad.config import get_config, command
 from vim_pad.modelines import format_modeline
 from glob import glob
 
 
+@command
 def update():
     """ Moves a note to a new location if its contents are modified.
 
@@ -18,7 +20,7 @@ def update():
         return
 
     modified = bool(int(vim.eval("b:pad_modified")))
-    can_rename = bool(int(vim.eval("g:pad#rename_files")))
+    can_rename = get_config().flag("rename_files")
     if modified and can_rename:
         _id = PadInfo(vim.current.buffer).id
         old_path = expanduser(vim.current.buffer.name)
@@ -33,11 +35,14 @@ def update():
                 new_path = ".".join([
                                     expanduser(join(get_save_dir(), _id)),
                                     str(int(max(exts)) + 1)])
-            new_path = new_path + vim.eval("g:pad#default_file_extension")
+            new_path = new_path + get_config()["default_file_extension"]
             vim.command("bw")
             move(old_path, new_path)
+            touch(old_path)
+            touch(new_path)
 
 
+@command
 def delete():
     """ (Local command) Deletes the current note.
     """
@@ -46,40 +51,49 @@ def delete():
         confirm = vim.eval('input("really delete? (y/n): ")')
         if confirm in ("y", "Y"):
             remove(path)
+            touch(path)
             vim.command("bd!")
             vim.command("redraw!")
 
 
+@command
 def add_modeline():
     """ (Local command) Add a modeline to the current note.
     """
     mode = vim.eval('input("filetype: ", "", "filetype")')
     if mode:
         args = [format_modeline(mode)]
-        if vim.eval('g:pad#modeline_position') == 'top':
+        if get_config()["modeline_position"] == 'top':
             args.append(0)
         vim.current.buffer.append(*args)
         vim.command("set filetype=" + mode)
         vim.command("set nomodified")
 
 
+@command
 def move_to_folder(path=None):
     if path is None:
         path = vim.eval("input('move to: ')")
     new_path = join(get_save_dir(), path, basename(vim.current.buffer.name))
     if not exists(join(get_save_dir(), path)):
         mkdir(join(get_save_dir(), path))
-    move(vim.current.buffer.name, new_path)
+    old_path = vim.current.buffer.name
+    move(old_path, new_path)
+    touch(old_path)
+    touch(new_path)
     vim.command("bd")
 
 
+@command
 def move_to_savedir():
     move_to_folder("")
 
 
+@command
 def archive():
     move_to_folder("archive")
 
 
+@command
 def unarchive():
     move_to_savedir()
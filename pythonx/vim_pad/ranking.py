@@ -0,0 +1,97 @@
+# coding=utf-8
+""" Ranked search, used when g:pad#search_ranked is set.
+
+Searches return the matching lines of each note instead of just its path.
+From them, and the note data already in the index, each note gets a score
+(a match in the title counts most, then how many lines match, then how
+recent the note is) and a snippet, the line shown in the list in place of
+the start of the body.
+"""
+import re
+import time
+from math import log
+
+# how many matching lines we want from each note
+MAX_LINES = 20
+TITLE_WEIGHT = 4.0
+# the age at which the recency bonus is halved
+RECENCY_DAYS = 30.0
+SNIPPET_WIDTH = 80
+
+GREP_LINE_RE = re.compile(r"^(.*?):(\d+):(.*)$")
+
+
+def parse_output(output):
+    """ Returns a dict mapping each note in the output of a search command
+    (lines like "path:lineno:text") to its (lineno, text) pairs.
+    """
+    matches = {}
+    for line in output.split("\n"):
+        match = GREP_LINE_RE.match(line)
+        if match:
+            path, lineno, text = match.groups()
+            matches.setdefault(path, []).append((int(lineno), text))
+    return matches
+
+
+def compile_query(query, ignorecase):
+    """ Returns a regex for query, for matching in Python what the search
+    backend matched. Queries that aren't valid Python regexes are matched
+    literally.
+    """
+    flags = re.IGNORECASE if ignorecase else 0
+    try:
+        return re.compile(query, flags)
+    except re.error:
+        return re.compile(re.escape(query), flags)
+
+
+def score(entry, lines, mtime, regex, now):
+    """ Returns the score of a note.
+
+    entry: its index entry.
+
+    lines: its matching (lineno, text) pairs.
+    """
+    title = TITLE_WEIGHT if regex.search(entry.summary) else 0.0
+    age_days = max(now - mtime, 0) / 86400.0
+    return title + log(1 + len(lines)) + 1.0 / (1 + age_days / RECENCY_DAYS)
+
+
+def snippet(entry, lines, regex):
+    """ Returns the part of the first matching line that isn't the title,
+    around the match, or "" if there is none.
+    """
+    for lineno, text in lines:
+        text = " ".join(text.split())
+        if text == "" or (entry.summary != "" and entry.summary in text):
+            continue
+        match = regex.search(text)
+        # we clip the decoded text, so we don't cut a character in half
+        before = text[:match.start()] if match else ""
+        text = text.decode("utf-8", "replace")
+        start = max(len(before.decode("utf-8", "ignore")) - SNIPPET_WIDTH / 4, 0)
+        clipped = text[start:start + SNIPPET_WIDTH]
+        if start > 0:
+            clipped = u"\u2026" + clipped
+        if start + SNIPPET_WIDTH < len(text):
+            clipped = clipped + u"\u2026"
+        return clipped.encode("utf-8")
+    return ""
+
+
+def rank(records, entries, matches, regex):
+    """ Returns the (path, stat) records ordered by score, best first, and a
+    dict with the snippet for each note.
+
+    matches: a dict mapping paths to their matching (lineno, text) pairs.
+    """
+    now = time.time()
+    scored = []
+    snippets = {}
+    for (path, st), entry in zip(records, entries):
+        lines = matches.get(path, [])
+        scored.append((score(entry, lines, st.st_mtime, regex, now), (path, st)))
+        snippets[path] = snippet(entry, lines, regex)
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [record for value, record in scored], snippets
@@ -0,0 +1,169 @@
+# coding=utf-8
+""" In-process full-text search, used when g:pad#search_backend is "internal".
+
+Every note under a root is kept in memory along with a trigram inverted
+index. Queries without regex metacharacters are answered by intersecting the
+posting sets of their trigrams and checking the few candidates left; other
+queries are matched against the cached text of every note. Either way, no
+process is spawned and no file is read unless it changed.
+"""
+import re
+from os.path import relpath, sep
+
+REGEX_METACHARS = set(".^$*+?{}[]\\|()")
+
+
+def trigrams(text):
+    return set(text[i:i + 3] for i in xrange(len(text) - 2))
+
+
+def is_literal(query):
+    return not any(c in REGEX_METACHARS for c in query)
+
+
+def in_archive(root, path):
+    return "archive" in relpath(path, root).split(sep)[:-1]
+
+
+def compile_query(query, ignorecase):
+    """ Returns query, a regex, compiled as the backends match it against
+    the decoded notes, or None if it isn't valid.
+    """
+    flags = re.UNICODE | re.MULTILINE
+    if ignorecase:
+        flags |= re.IGNORECASE
+    try:
+        return re.compile(query.decode("utf-8", "replace"), flags)
+    except re.error:
+        return None
+
+
+def matching_lines(text, regex, max_lines):
+    """ Returns up to max_lines of the (lineno, line) pairs of text that
+    match regex, as ranking.rank wants them.
+    """
+    lines = []
+    for lineno, line in enumerate(text.split("\n")):
+        if regex.search(line):
+            lines.append((lineno + 1, line.encode("utf-8")))
+            if len(lines) == max_lines:
+                break
+    return lines
+
+
+class SearchIndex(object):
+
+    def __init__(self, root):
+        self.root = root
+        self.mtimes = {}     # path -> mtime when it was indexed
+        self.texts = {}      # path -> decoded contents
+        self.postings = {}   # trigram -> set of paths
+        self.version = 0     # of the WatchedNotes we synced with, if any
+
+    def _add(self, path, text):
+        self.texts[path] = text
+        for trigram in trigrams(text.lower()):
+            self.postings.setdefault(trigram, set()).add(path)
+
+    def _remove(self, path):
+        text = self.texts.pop(path)
+        for trigram in trigrams(text.lower()):
+            posting = self.postings.get(trigram)
+            if posting is not None:
+                posting.discard(path)
+                if not posting:
+                    del self.postings[trigram]
+        del self.mtimes[path]
+
+    def _update(self, path, mtime):
+        """ Reads path again if its mtime changed. mtime is None if the note
+        is gone.
+        """
+        if self.mtimes.get(path) == mtime:
+            return
+        if path in self.mtimes:
+            self._remove(path)
+        if mtime is None:
+            return
+        try:
+            with open(path) as note:
+                text = note.read().decode("utf-8", "replace")
+        except IOError:
+            return
+        self.mtimes[path] = mtime
+        self._add(path, text)
+
+    def refresh(self, records):
+        """ Brings the index up to date with records, the (path, stat) list
+        of the notes under the root. Only new or modified notes are read.
+        """
+        current = dict((path, st.st_mtime) for path, st in records)
+        for path in [p for p in self.mtimes if p not in current]:
+            self._remove(path)
+        for path, mtime in current.iteritems():
+            self._update(path, mtime)
+
+    def sync(self, notes):
+        """ Brings the index up to date with a watcher.WatchedNotes, reading
+        only the notes it saw changing since the last sync.
+        """
+        changed = notes.changes_since(self.version)
+        if changed is None:
+            self.refresh(notes.notes("!"))
+        else:
+            for path in changed:
+                st = notes.records.get(path)
+                self._update(path, st.st_mtime if st is not None else None)
+        self.version = notes.version
+
+    def candidates(self, query):
+        """ Returns the notes that might match query.
+        """
+        if not is_literal(query) or len(query) < 3:
+            return set(self.texts)
+        matches = None
+        for trigram in trigrams(query.lower()):
+            posting = self.postings.get(trigram, set())
+            matches = posting.copy() if matches is None else matches & posting
+            if not matches:
+                break
+        return matches
+
+    def search(self, query, archive, ignorecase):
+        """ Returns the notes whose contents match query, a regex.
+
+        archive: if it is not "!", archived notes are excluded.
+        """
+        return [path for path, text, regex in self.matches(query, archive, ignorecase)]
+
+    def search_lines(self, query, archive, ignorecase, max_lines):
+        """ Like search, but returns a dict mapping each note to up to
+        max_lines of its matching (lineno, line) pairs, as ranking.rank
+        wants them.
+        """
+        return dict((path, matching_lines(text, regex, max_lines))
+                    for path, text, regex in self.matches(query, archive, ignorecase))
+
+    def matches(self, query, archive, ignorecase):
+        """ Yields (path, text, regex) for the notes matching query.
+        """
+        regex = compile_query(query, ignorecase)
+        if regex is None:
+            return
+        for path in self.candidates(query.decode("utf-8", "replace")):
+            if archive != "!" and in_archive(self.root, path):
+                continue
+            text = self.texts[path]
+            if regex.search(text):
+                yield path, text, regex
+
+
+_indexes = {}
+
+
+def get_search_index(root):
+    """ Returns the SearchIndex for root, creating an empty one on first use.
+    """
+    if root not in _indexes:
+        _indexes[root] = SearchIndex(root)
+    return _indexes[root]
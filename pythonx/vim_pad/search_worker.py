@@ -0,0 +1,285 @@
+# coding=utf-8
+""" Searches from a long-lived helper process, used when g:pad#search_backend
+is "worker".
+
+The worker is this file, run by g:pad#worker_python. It keeps a SearchIndex
+(and, if g:pad#watch_dirs is set, a WatchedNotes) for each folder it was asked
+about, so the listings and the contents of the notes stay warm between
+searches, as with the "internal" backend, but outside of vim's memory and
+without a process being spawned for every query.
+
+The protocol is one JSON object per line: vim writes a request to the
+worker's stdin and reads the response from its stdout. Requests are
+
+    {"op": "search", "roots": [...], "query": ..., "archive": ...,
+     "ignorecase": ..., "watch": ..., "max_lines": N}
+
+answered by {"files": [paths]}, or by {"lines": {path: [[lineno, line]]}}
+when max_lines is more than 0, and {"op": "stats"}, answered by the size of
+the worker. Errors are answered by {"error": message}.
+
+After each request, a worker using more than its memory cap exits. The
+client starts a new one when it finds it gone, and starts over if the worker
+crashes. The first search of a folder reads all its notes, so it can take as
+long as it needs; other requests must be answered within TIMEOUT seconds, or
+the worker is stopped and not started again for BACKOFF seconds. A worker
+that exits right after its first answer can't hold the notes under its cap,
+so it isn't started again: each new one would read all the notes for every
+search.
+"""
+import json
+import os
+import sys
+import time
+from os.path import dirname, splitext
+from subprocess import Popen, PIPE
+try:
+    from select import select
+except ImportError:
+    select = None
+
+# how long we wait for an answer, in seconds, once the folders are indexed
+TIMEOUT = 10
+# how long we wait before starting a worker again after one timed out
+BACKOFF = 60
+
+
+class WorkerError(Exception):
+    pass
+
+
+class SearchWorker(object):
+    """ The vim side of a worker: starts it, sends it requests and restarts
+    it when needed.
+    """
+
+    def __init__(self, python, max_memory, interval):
+        self.python = python
+        self.max_memory = max_memory
+        self.interval = interval
+        self.process = None
+        self.starts = 0
+        self.indexed = set()  # the roots the running worker has read
+        self.answered = 0  # the requests the running worker answered
+        self.retry_at = 0  # when we can start a worker again, after a timeout
+
+    def start(self):
+        script = splitext(os.path.abspath(__file__))[0] + ".py"
+        self.process = Popen([self.python, script, str(self.max_memory), str(self.interval)],
+                             stdin=PIPE, stdout=PIPE, bufsize=-1,
+                             close_fds=os.name == "posix")
+        self.starts += 1
+        self.answered = 0
+        self.indexed = set()
+
+    def stop(self):
+        if self.process is not None:
+            try:
+                self.process.kill()
+                self.process.wait()
+            except OSError:
+                pass
+            self.process = None
+
+    def exited(self):
+        """ Cleans up after a worker that exited or stopped responding.
+        Raises a WorkerError if it did so after its first answer.
+        """
+        answered = self.answered
+        self.stop()
+        if self.max_memory > 0 and answered == 1:
+            self.retry_at = float("inf")
+            raise WorkerError("the notes need more than g:pad#worker_max_memory MB")
+
+    def backing_off(self):
+        """ Returns True if a worker timed out lately, or didn't fit in its
+        memory cap, and we are waiting before starting a new one.
+        """
+        return self.process is None and time.time() < self.retry_at
+
+    def read_line(self, timeout):
+        """ Returns the next line from the worker, "" if it exited, or None
+        if it wrote nothing for timeout seconds (None to wait as needed).
+        """
+        stdout = self.process.stdout
+        if timeout is not None and select is not None and os.name == "posix":
+            if select([stdout], [], [], timeout)[0] == []:
+                return None
+        return stdout.readline()
+
+    def request(self, message, roots=()):
+        """ Sends message to the worker, starting it if it isn't running,
+        and returns its answer. If the worker dies, a new one is tried once
+        before giving up with a WorkerError.
+
+        roots: the folders the request is about. If the worker hasn't read
+        them yet, there is no timeout.
+        """
+        for attempt in range(2):
+            if self.process is not None and self.process.poll() is not None:
+                self.exited()
+            if self.process is None:
+                if self.backing_off():
+                    raise WorkerError("the search worker is stopped, waiting to restart it")
+                try:
+                    self.start()
+                except OSError as e:
+                    raise WorkerError("can't start %s: %s" % (self.python, e))
+            timeout = TIMEOUT if set(roots) <= self.indexed else None
+            try:
+                self.process.stdin.write(json.dumps(message) + "\n")
+                self.process.stdin.flush()
+                line = self.read_line(timeout)
+                if line is None:
+                    # a new worker would be as slow; give it a rest
+                    self.stop()
+                    self.retry_at = time.time() + BACKOFF
+                    raise WorkerError("the search worker didn't answer in %d seconds" % timeout)
+                if line != "":
+                    response = json.loads(line)
+                    if "error" in response:
+                        raise WorkerError(response["error"])
+                    if roots:
+                        # the worker drops the roots it wasn't asked about
+                        self.indexed = set(roots)
+                    self.answered += 1
+                    return response
+            except (IOError, OSError, ValueError):
+                pass
+            self.exited()
+        raise WorkerError("the search worker stopped responding")
+
+    def search(self, roots, archive, query, ignorecase, watch, max_lines=0):
+        """ Returns the notes under roots matching query, or, if max_lines
+        is more than 0, a dict mapping them to their matching (lineno, line)
+        pairs, like SearchIndex.search_lines.
+        """
+        response = self.request({"op": "search", "roots": roots, "query": query,
+                                  "archive": archive, "ignorecase": ignorecase,
+                                  "watch": watch, "max_lines": max_lines}, roots)
+        if max_lines > 0:
+            return dict((path.encode("utf-8"),
+                         [(lineno, line.encode("utf-8")) for lineno, line in lines])
+                        for path, lines in response["lines"].iteritems())
+        return [path.encode("utf-8") for path in response["files"]]
+
+    def stats(self):
+        """ Returns the stats of the worker, or None if it isn't running.
+        """
+        if self.process is None or self.process.poll() is not None:
+            return None
+        return self.request({"op": "stats"})
+
+
+_workers = {}
+
+
+def get_search_worker(python, max_memory, interval):
+    """ Returns the SearchWorker for these settings, creating it on first use.
+    """
+    key = (python, max_memory, interval)
+    if key not in _workers:
+        for worker in _workers.values():
+            worker.stop()
+        _workers.clear()
+        _workers[key] = SearchWorker(python, max_memory, interval)
+    return _workers[key]
+
+
+# the worker process {{{1
+
+def resident_memory():
+    """ Returns the resident memory of the process, in MB.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1048576.0
+    except (IOError, OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1048576.0 if sys.platform == "darwin" else 1024.0)
+
+
+class Server(object):
+
+    def __init__(self, interval):
+        from vim_pad.search_index import SearchIndex
+        from vim_pad.watcher import WatchedNotes
+        from vim_pad.walk import scan_notes
+        self.SearchIndex = SearchIndex
+        self.WatchedNotes = WatchedNotes
+        self.scan_notes = scan_notes
+        self.interval = interval
+        self.indexes = {}
+        self.watched = {}
+        self.requests = 0
+
+    def index(self, root, watch):
+        if root not in self.indexes:
+            self.indexes[root] = self.SearchIndex(root)
+        index = self.indexes[root]
+        if watch:
+            if root not in self.watched:
+                self.watched[root] = self.WatchedNotes(root, self.interval)
+            notes = self.watched[root]
+            notes.sync()
+            index.sync(notes)
+        else:
+            index.refresh(self.scan_notes(root, "!"))
+        return index
+
+    def search(self, request):
+        roots = [root.encode("utf-8") for root in request["roots"]]
+        # the local dirs of folders vim left aren't searched anymore
+        for root in [root for root in self.indexes if root not in roots]:
+            del self.indexes[root]
+            if root in self.watched:
+                self.watched.pop(root).close()
+        query = request["query"].encode("utf-8")
+        args = (query, request["archive"], request["ignorecase"])
+        if request["max_lines"] > 0:
+            found = {}
+            for root in roots:
+                found.update(self.index(root, request["watch"]).search_lines(
+                        *(args + (request["max_lines"],))))
+            return {"lines": found}
+        files = []
+        for root in roots:
+            files.extend(self.index(root, request["watch"]).search(*args))
+        return {"files": files}
+
+    def stats(self, request):
+        return {"rss": resident_memory(), "requests": self.requests,
+                "notes": sum(len(index.texts) for index in self.indexes.values())}
+
+    def handle(self, line):
+        self.requests += 1
+        try:
+            request = json.loads(line)
+            if request["op"] not in ("search", "stats"):
+                raise ValueError("unknown op %r" % request["op"])
+            return getattr(self, request["op"])(request)
+        except Exception as e:
+            return {"error": "%s: %s" % (type(e).__name__, e)}
+
+
+def serve(max_memory, interval):
+    """ Answers the requests in stdin until it is closed, or until the
+    process uses more than max_memory MB.
+    """
+    server = Server(interval)
+    while True:
+        line = sys.stdin.readline()
+        if line == "":
+            break
+        sys.stdout.write(json.dumps(server.handle(line)) + "\n")
+        sys.stdout.flush()
+        if max_memory > 0 and resident_memory() > max_memory:
+            break
+
+
+if __name__ == "__main__":
+    # run as a script, the package isn't on the path yet
+    sys.path.insert(0, dirname(dirname(os.path.abspath(__file__))))
+    serve(int(sys.argv[1]), int(sys.argv[2]))
+# vim: set fdm=marker :
@@ -0,0 +1,145 @@
+# coding=utf-8
+""" Timings of the last operations, for :Pad stats.
+
+When g:pad#stats is set, each listing, incremental search query, sort and
+render is recorded as an operation: how long each of its phases took (walking
+the folders, searching, stat'ing, reading and parsing notes, formatting the
+lines and writing them to the buffer) and counters like how many notes were
+read and how many index lookups hit. The last g:pad#stats_history ones are
+kept, and each is also appended to g:pad#stats_log, if set.
+
+When g:pad#stats is not set, phase() and add_count() only check a global.
+"""
+import time
+from collections import deque
+from os.path import expanduser
+from vim_pad.config import get_config
+
+# in the order they are shown
+PHASES = ("walk", "search", "stat", "read", "parse", "format", "write", "sort")
+
+
+class Operation(object):
+
+    def __init__(self, name, detail):
+        self.name = name
+        self.detail = detail
+        self.start = time.time()
+        self.seconds = 0.0
+        self.phases = {}
+        self.counts = {}
+
+    def format(self):
+        """ Returns the operation as a line of text.
+        """
+        # phases that took no time (nothing to read...) aren't shown
+        phases = "  ".join("%s %.1f" % (name, self.phases[name] * 1000)
+                           for name in PHASES if self.phases.get(name, 0) >= 0.00005)
+        counts = " ".join("%s=%d" % item for item in sorted(self.counts.items()))
+        return "%s %-24s %8.1fms  %s%s" % (
+                time.strftime("%H:%M:%S", time.localtime(self.start)),
+                (self.name + " " + repr(self.detail) if self.detail else self.name)[:24],
+                self.seconds * 1000, phases, " | " + counts if counts else "")
+
+
+class NullTimer(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class PhaseTimer(object):
+
+    def __init__(self, operation, name):
+        self.operation = operation
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc):
+        phases = self.operation.phases
+        phases[self.name] = phases.get(self.name, 0.0) + time.time() - self.start
+        return False
+
+
+class OperationTimer(object):
+
+    def __init__(self, name, detail):
+        self.name = name
+        self.detail = detail
+
+    def __enter__(self):
+        global _current
+        _current = Operation(self.name, self.detail)
+        return self
+
+    def __exit__(self, *exc):
+        global _current
+        operation, _current = _current, None
+        operation.seconds = time.time() - operation.start
+        record(operation)
+        return False
+
+
+_null = NullTimer()
+_current = None
+_history = deque(maxlen=10)
+
+
+def operation(name, detail=""):
+    """ Returns a context manager that records what happens inside it as an
+    operation, if g:pad#stats is set and no operation is being recorded.
+    """
+    if _current is not None or not get_config().flag("stats"):
+        return _null
+    return OperationTimer(name, detail)
+
+
+def phase(name):
+    """ Returns a context manager that adds the time spent inside it to
+    the phase name of the current operation, if any.
+    """
+    if _current is None:
+        return _null
+    return PhaseTimer(_current, name)
+
+
+def recording():
+    """ Tells whether an operation is being recorded, for counters that
+    cost something to compute.
+    """
+    return _current is not None
+
+
+def add_count(name, n=1):
+    """ Adds n to the counter name of the current operation, if any.
+    """
+    if _current is not None:
+        _current.counts[name] = _current.counts.get(name, 0) + n
+
+
+def record(operation):
+    global _history
+    config = get_config()
+    size = max(config.number("stats_history"), 1)
+    if _history.maxlen != size:
+        _history = deque(_history, maxlen=size)
+    _history.append(operation)
+    if config["stats_log"] != "":
+        try:
+            with open(expanduser(config["stats_log"]), "a") as log:
+                log.write(time.strftime("%Y-%m-%d ", time.localtime(operation.start)) +
+                          operation.format() + "\n")
+        except IOError:
+            pass
+
+
+def history():
+    """ Returns the recorded operations, oldest first.
+    """
+    return list(_history)
@@ -51,7 +51,31 @@ def natural_timestamp(timestamp):
     24 hours, and the format %Y-%m-%d %H:%M:%S otherwise.
     """
     timestamp = basename(timestamp)
-    f_timestamp = float(timestamp) / 1000000
+    return _natural_timestamp(float(timestamp) / 1000000)[0]
+
+
+# mtime -> formatted timestamp, for the ones that won't change anymore
+_fixed_timestamps = {}
+
+
+def mtime_timestamp(mtime):
+    """mtime_timestamp(float:mtime) -> str:natural_timestamp
+
+    Like natural_timestamp, for a modification time in seconds. Timestamps
+    older than 24 hours don't change, so they are only formatted once.
+    """
+    text = _fixed_timestamps.get(mtime)
+    if text is None:
+        text, fixed = _natural_timestamp(int(mtime * 1000000) / 1000000.0)
+        if fixed:
+            _fixed_timestamps[mtime] = text
+    return text
+
+
+def _natural_timestamp(f_timestamp):
+    """ Returns the natural timestamp for f_timestamp, in seconds, and
+    whether it is in the absolute format.
+    """
     tmp_datetime = datetime.datetime.fromtimestamp(f_timestamp)
     diff = datetime.datetime.now() - tmp_datetime
     days = diff.days
@@ -60,20 +84,19 @@ def natural_timestamp(timestamp):
     hours = minutes / 60
 
     if days > 0:
-        return tmp_datetime.strftime("%Y-%m-%d %H:%M:%S")
+        return tmp_datetime.strftime("%Y-%m-%d %H:%M:%S"), True
     if hours < 1:
         if minutes < 1:
-            return str(seconds) + "s ago"
+            return str(seconds) + "s ago", False
         else:
             seconds_diff = seconds - (minutes * 60)
             if seconds_diff != 0:
-                return str(minutes) + "m and " + str(seconds_diff) + "s ago"
+                return str(minutes) + "m and " + str(seconds_diff) + "s ago", False
             else:
-                return str(minutes) + "m ago"
+                return str(minutes) + "m ago", False
     else:
         minutes_diff = minutes - (hours * 60)
         if minutes_diff != 0:
-            return str(hours) + "h and " + str(minutes_diff) + "m ago"
+            return str(hours) + "h and " + str(minutes_diff) + "m ago", False
         else:
-            return str(hours) + "h ago"
-
+            return str(hours) + "h ago", False
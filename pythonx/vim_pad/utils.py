@@ -1,10 +1,11 @@
-import vim
 from os import rmdir
-from os.path import expanduser, split
+from sys import modules
+from os.path import split
+from vim_pad.config import get_config
 
 
 def get_save_dir():
-    return expanduser(vim.eval("g:pad#dir")).replace("\\", "\\\\")
+    return get_config().save_dir
 
 
 def make_sure_dir_is_empty(path):  # {{{1
@@ -13,3 +14,13 @@ def make_sure_dir_is_empty(path):  # {{{1
     except:
         pass
 
+
+
+def touch(path):  # {{{1
+    """ Tells the folder watchers that path changed, if any was started.
+    Unlike vim_pad.watcher.touch, doesn't import the watcher when there is
+    nothing to tell.
+    """
+    watcher = modules.get("vim_pad.watcher")
+    if watcher is not None:
+        watcher.touch(path)
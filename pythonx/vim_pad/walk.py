@@ -0,0 +1,78 @@
+from os import listdir, stat, lstat
+from os.path import join, relpath, sep
+from stat import S_ISDIR, S_ISREG, S_ISLNK
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+
+def dir_entries(root):
+    """ Yields (name, path, stat) for the entries in root. stat is None for
+    folders, which are not followed if they are symlinks.
+    """
+    if scandir is not None:
+        for entry in scandir(root):
+            if entry.is_dir(follow_symlinks=False):
+                yield entry.name, entry.path, None
+            else:
+                try:
+                    yield entry.name, entry.path, entry.stat()
+                except OSError:  # broken symlink
+                    pass
+    else:
+        for name in listdir(root):
+            path = join(root, name)
+            try:
+                st = lstat(path)
+                if S_ISDIR(st.st_mode):
+                    yield name, path, None
+                elif S_ISLNK(st.st_mode):
+                    yield name, path, stat(path)
+                else:
+                    yield name, path, st
+            except OSError:
+                pass
+
+
+def scan_notes(path, archive):
+    """ Returns a list of (path, stat) records for the notes under path.
+
+    Hidden files and folders are skipped, and so are archive folders, unless
+    archive is "!". Each note is stat'ed only once.
+    """
+    records = []
+    roots = [path]
+    while roots:
+        root = roots.pop()
+        try:
+            entries = list(dir_entries(root))
+        except OSError:
+            continue
+        for name, entry_path, st in entries:
+            if name.startswith('.'):
+                continue
+            if st is None:
+                if archive == "!" or name != "archive":
+                    roots.append(entry_path)
+            elif S_ISREG(st.st_mode):
+                records.append((entry_path, st))
+    return records
+
+
+def signature(st):
+    """ Returns the part of a stat result we use to detect changes.
+    """
+    return (st.st_mtime, st.st_size, st.st_ino)
+
+
+def is_listed(root, path, archive):
+    """ Tells whether scan_notes(root, archive) would return path.
+    """
+    parts = relpath(path, root).split(sep)
+    if parts[0] == ".." or any(part.startswith(".") for part in parts):
+        return False
+    return archive == "!" or "archive" not in parts[:-1]
@@ -0,0 +1,280 @@
+# coding=utf-8
+""" Watches the notes folders, so listings don't have to walk them.
+
+WatchedNotes keeps the (path, stat) records of the notes under a root, and
+updates only the ones a watcher reports as changed. On Linux the watcher uses
+inotify; elsewhere (or when inotify can't be used) a thread walks the folder
+every few seconds, outside of vim's main loop.
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+import threading
+import time
+from os.path import join
+from stat import S_ISREG
+from vim_pad.walk import scan_notes, is_listed, signature
+
+# inotify constants, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | \
+        IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+# how many changes WatchedNotes remembers for changes_since
+MAX_LOG = 10000
+
+
+class InotifyWatcher(object):
+    """ Reports the notes changed under root, using inotify.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}  # watch descriptor -> folder
+        self.pending = set()
+        self.needs_rescan = False
+        try:
+            self.watch_tree(root)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def watch_tree(self, path):
+        for root, dirnames, filenames in os.walk(path):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            wd = self.libc.inotify_add_watch(self.fd, root, WATCH_MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+            self.dirs[wd] = root
+
+    def read_events(self):
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except OSError as e:
+                if e.errno == errno.EAGAIN:
+                    return
+                raise
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip("\0")
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    self.needs_rescan = True
+                elif mask & IN_ISDIR or mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    # folders appearing or going away are rare enough that
+                    # we just walk everything again
+                    self.needs_rescan = True
+                elif wd in self.dirs and name and not name.startswith("."):
+                    self.pending.add(join(self.dirs[wd], name))
+
+    def changes(self):
+        """ Returns (paths, rescan): the paths changed since the last call,
+        and whether they can't be trusted and the root must be walked again.
+
+        Raises OSError if the folders can't be watched anymore.
+        """
+        self.read_events()
+        if self.dirs == {} and os.path.isdir(self.root):
+            # the root didn't exist when we started watching it (the local
+            # dir usually doesn't), or was replaced
+            self.needs_rescan = True
+        paths, rescan = self.pending, self.needs_rescan
+        self.pending = set()
+        if rescan:
+            self.needs_rescan = False
+            for wd in list(self.dirs):
+                self.libc.inotify_rm_watch(self.fd, wd)
+            self.dirs = {}
+            self.watch_tree(self.root)
+        return paths, rescan
+
+    def touch(self, path):
+        self.pending.add(path)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher(object):
+    """ Reports the notes changed under root, by walking it periodically in a
+    background thread.
+    """
+
+    def __init__(self, root, interval):
+        self.root = root
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.closed = False
+        self.snapshot = self.scan()
+        thread = threading.Thread(target=self.run)
+        thread.daemon = True
+        thread.start()
+
+    def scan(self):
+        return dict((path, signature(st)) for path, st in scan_notes(self.root, "!"))
+
+    def run(self):
+        while not self.closed:
+            time.sleep(self.interval)
+            snapshot = self.scan()
+            changed = set(path for path, sig in snapshot.iteritems()
+                          if self.snapshot.get(path) != sig)
+            changed.update(path for path in self.snapshot if path not in snapshot)
+            self.snapshot = snapshot
+            if changed:
+                with self.lock:
+                    self.pending.update(changed)
+
+    def changes(self):
+        with self.lock:
+            paths, self.pending = self.pending, set()
+        return paths, False
+
+    def touch(self, path):
+        with self.lock:
+            self.pending.add(path)
+
+    def close(self):
+        self.closed = True
+
+
+def make_watcher(root, interval):
+    try:
+        return InotifyWatcher(root)
+    except (OSError, AttributeError):  # not linux, or out of watches
+        return PollingWatcher(root, interval)
+
+
+class WatchedNotes(object):
+    """ The (path, stat) records of the notes under root, as scan_notes(root,
+    "!") would return them, kept up to date by a watcher.
+    """
+
+    def __init__(self, root, interval=5):
+        self.root = root
+        self.interval = interval
+        self.watcher = make_watcher(root, interval)
+        self.version = 0
+        self.log = []  # (version, path) for each change
+        self.rescan()
+
+    def rescan(self):
+        self.records = dict(scan_notes(self.root, "!"))
+        self.version += 1
+        self.log = [(self.version, None)]  # older versions need a refresh
+        self.lists = {}
+
+    def sync(self):
+        """ Applies the changes reported by the watcher. Costs nothing if
+        there are none.
+        """
+        try:
+            paths, rescan = self.watcher.changes()
+        except OSError:
+            # out of inotify watches, or a folder went away while we walked
+            # the tree again: we poll instead
+            self.watcher.close()
+            self.watcher = PollingWatcher(self.root, self.interval)
+            paths, rescan = set(), True
+        if rescan:
+            self.rescan()
+            return
+        changed = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                st = None
+            if st is not None and S_ISREG(st.st_mode) and is_listed(self.root, path, "!"):
+                old = self.records.get(path)
+                if old is None or signature(old) != signature(st):
+                    self.records[path] = st
+                    changed.append(path)
+            elif self.records.pop(path, None) is not None:
+                changed.append(path)
+        if changed == []:
+            return
+        self.version += 1
+        self.log.extend((self.version, path) for path in changed)
+        if len(self.log) > MAX_LOG:
+            self.log = [(self.version, None)]
+        self.lists = {}
+
+    def notes(self, archive):
+        """ Returns the records of the notes, skipping archived ones unless
+        archive is "!". The same list is returned while nothing changes.
+        """
+        self.sync()
+        key = archive == "!"
+        if key not in self.lists:
+            self.lists[key] = [(path, st) for path, st in self.records.iteritems()
+                               if is_listed(self.root, path, archive)]
+        return self.lists[key]
+
+    def changes_since(self, version):
+        """ Returns the paths changed after version, or None if they are not
+        known anymore (and everything should be considered changed).
+        """
+        self.sync()
+        if self.log[0][0] > version:
+            return None
+        return set(path for v, path in self.log if v > version)
+
+    def touch(self, path):
+        """ Tells the watcher that path changed, without waiting for it to
+        notice.
+        """
+        self.watcher.touch(path)
+
+    def close(self):
+        self.watcher.close()
+
+
+_watched = {}
+
+
+def get_watched_notes(root, interval=5):
+    """ Returns the WatchedNotes for root, starting to watch it on first use.
+    """
+    if root not in _watched:
+        _watched[root] = WatchedNotes(root, interval)
+    return _watched[root]
+
+
+def close_watched_notes(keep):
+    """ Stops watching the roots that are not in keep, like the local dirs
+    of the folders vim was in before.
+    """
+    for root in [root for root in _watched if root not in keep]:
+        _watched.pop(root).close()
+
+
+def touch(path):
+    """ Tells the watchers of the folders containing path that it changed.
+    """
+    for root, notes in _watched.iteritems():
+        if is_listed(root, path, "!"):
+            notes.touch(path)